@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" synthetic microformat pages for benchmarking
+
+Each generator takes a scale (roughly, the number of microformat roots on
+the page) and returns the html for a complete page.
+"""
+
+import random
+import sys
+from optparse import OptionParser
+
+
+def _page(body):
+    return '<!DOCTYPE html>\n<html><head><title>benchmark</title></head><body>\n%s\n</body></html>\n' % body
+
+
+def _filler(rand, words=20):
+    vocabulary = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do')
+    return ' '.join(rand.choice(vocabulary) for i in range(words))
+
+
+def _hcard(rand, i):
+    return """<div class="vcard">
+  <a class="url fn n" href="http://example.com/people/%(i)d">
+    <span class="given-name">Given%(i)d</span> <span class="family-name">Family%(i)d</span></a>
+  <div class="org">Organisation %(i)d</div>
+  <a class="email" href="mailto:person%(i)d@example.com">person%(i)d@example.com</a>
+  <div class="adr">
+    <div class="street-address">%(i)d High Street</div>
+    <span class="locality">Town</span>, <span class="region">County</span>
+    <span class="postal-code">AB%(i)d 1CD</span> <span class="country-name">United Kingdom</span>
+  </div>
+  <div class="tel"><span class="type">work</span> <span class="value">01234 %(i)06d</span></div>
+  <div class="tel"><span class="type">home</span> <span class="value">05678 %(i)06d</span></div>
+  <div class="note">%(note)s</div>
+</div>""" % {'i': i, 'note': _filler(rand, 50)}
+
+
+def hcards(scale, seed=0):
+    """a flat list of hcards"""
+    rand = random.Random(seed)
+    return _page('\n'.join(_hcard(rand, i) for i in range(scale)))
+
+
+def hnews(scale, seed=0):
+    """an hfeed of hnews entries, each with author and source-org vcards"""
+    rand = random.Random(seed)
+    entries = []
+    for i in range(scale):
+        entries.append("""<div class="hentry hnews">
+  <h2 class="entry-title">Headline %(i)d</h2>
+  <span class="author vcard"><span class="fn">Reporter %(i)d</span></span>
+  <span class="source-org vcard"><span class="fn org">News Agency</span></span>
+  <abbr class="published" title="2009-04-%(day)02dT%(hour)02d:17:29Z">earlier</abbr>
+  <abbr class="updated" title="2009-04-%(day)02dT%(hour)02d:47:29Z">later</abbr>
+  <div class="entry-content"><p>%(content)s</p><p>%(content)s</p></div>
+  <a rel="tag" href="http://example.com/tags/%(tag)s">%(tag)s</a>
+</div>""" % {'i': i, 'day': i % 28 + 1, 'hour': i % 24, 'content': _filler(rand, 200), 'tag': rand.choice(('news', 'sport', 'weather'))})
+    return _page('<div class="hfeed">\n%s\n</div>' % '\n'.join(entries))
+
+
+def deep(scale, seed=0, depth=40):
+    """hcards buried in deeply nested markup"""
+    rand = random.Random(seed)
+    cards = []
+    for i in range(scale):
+        cards.append('<div><span>' * depth + _hcard(rand, i) + '</span></div>' * depth)
+    return _page('\n'.join(cards))
+
+
+def datetimes(scale, seed=0):
+    """hcalendar events using the value-class-pattern for their dates"""
+    rand = random.Random(seed)
+    events = []
+    for i in range(scale):
+        events.append("""<div class="vevent">
+  <span class="summary">Event %(i)d</span>
+  <span class="dtstart"><span class="value">2010-%(month)02d-%(day)02d</span> at
+    <span class="value">%(hour)d:30pm</span> <span class="value">-0500</span></span>
+  <span class="dtend"><abbr class="value" title="2010-%(month)02d-%(day)02d">the same day</abbr>
+    <span class="value-title" title="23:00"> </span></span>
+  <span class="location">Venue %(venue)d</span>
+</div>""" % {'i': i, 'month': i % 12 + 1, 'day': i % 28 + 1, 'hour': rand.randint(1, 11), 'venue': rand.randint(1, 20)})
+    return _page('\n'.join(events))
+
+
+# name -> (generator, formats worth extracting from it)
+scenarios = {
+    'hcards': (hcards, ['hcard']),
+    'hnews': (hnews, ['hnews', 'hentry', 'hcard', 'rel-tag']),
+    'deep': (deep, ['hcard']),
+    'datetimes': (datetimes, ['hcalendar']),
+}
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    parser = OptionParser('usage: %prog <scenario> <scale>')
+    options, arguments = parser.parse_args(argv[1:])
+    if len(arguments) != 2 or arguments[0] not in scenarios:
+        parser.error('expected one of %s and a scale' % ', '.join(sorted(scenarios)))
+
+    generator, formats = scenarios[arguments[0]]
+    sys.stdout.write(generator(int(arguments[1])))
+
+if __name__ == '__main__':
+    sys.exit(main())
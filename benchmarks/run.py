@@ -0,0 +1,189 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" benchmark the parser on synthetic pages (see corpus.py)
+
+Each scenario runs in its own process, so its peak memory can be
+measured. The results are written as json, for comparing runs over time:
+
+    python benchmarks/run.py --scale 200 -o before.json
+"""
+
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import traceback
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import lxml.etree
+import microtron
+from microtron import Parser
+
+import corpus
+
+
+# Parser methods making up each phase of a parse. Time spent in a method
+# is charged to its own phase, not to the phase of whatever called it.
+phases = {
+    'roots': ('_find',),
+    'properties': ('_find_props',),
+    'values': ('_parse_value', '_find_value_nodes', '_get_value_frag', '_parse_text'),
+    'datetimes': ('_parse_datetime_value',),
+}
+
+
+class PhaseTimer(object):
+    """time the phases of a parse by temporarily wrapping Parser methods"""
+
+    def __init__(self):
+        self.times = dict((phase, 0.0) for phase in phases)
+        self.calls = dict((phase, 0) for phase in phases)
+        self._stack = []
+        self._originals = {}
+
+    def __enter__(self):
+        for phase, methods in phases.items():
+            for name in methods:
+                original = getattr(Parser, name)
+                self._originals[name] = original
+                setattr(Parser, name, self._wrap(phase, original))
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, original in self._originals.items():
+            setattr(Parser, name, original)
+        return False
+
+    def _wrap(self, phase, method):
+        timer = self
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            timer._stack.append(0.0)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.time() - start
+                nested = timer._stack.pop()
+                timer.times[phase] += elapsed - nested
+                timer.calls[phase] += 1
+                if timer._stack:
+                    timer._stack[-1] += elapsed
+        return wrapper
+
+
+def _maxrss():
+    """peak resident memory of this process, in kB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _best(fn, repeat):
+    """fastest of repeat runs of fn, and its last result"""
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        result = fn()
+        times.append(time.time() - start)
+    return min(times), result
+
+
+def run_scenario(name, scale, repeat, options):
+    generator, formats = corpus.scenarios[name]
+    html = generator(scale)
+    baseline = _maxrss()
+
+    load_time, tree = _best(lambda: microtron.load(html), repeat)
+    schema = microtron.default_schema()
+
+    result = {
+        'scenario': name,
+        'scale': scale,
+        'bytes': len(html),
+        'elements': sum(1 for element in tree.iter(lxml.etree.Element)),
+        'options': options,
+        'load': load_time,
+        'formats': {},
+    }
+
+    for mf in formats:
+        parse_time, results = _best(lambda: Parser(tree, schema, **options).parse_format(mf), repeat)
+        stats = microtron.ParserStats()
+        with PhaseTimer() as timer:
+            Parser(tree, schema, stats=stats, **options).parse_format(mf)
+        result['formats'][mf] = {
+            'results': len(results),
+            'parse': parse_time,
+            'phases': timer.times,
+            'calls': timer.calls,
+            'stats': stats.as_dict(),
+        }
+
+    result['maxrss_kb'] = _maxrss()
+    result['maxrss_delta_kb'] = result['maxrss_kb'] - baseline
+    return result
+
+
+def _run_in_child(queue, *args):
+    try:
+        queue.put((run_scenario(*args), None))
+    except Exception:
+        queue.put((None, traceback.format_exc()))
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    parser = OptionParser('usage: %prog [options]')
+    parser.add_option("-s", "--scenario", action="append", dest="scenarios",
+                  help="scenario to run (may be repeated; default all of: %s)" % ', '.join(sorted(corpus.scenarios)))
+    parser.add_option("-n", "--scale", type="int", dest="scale", default=100,
+                  help="number of microformat roots per page")
+    parser.add_option("-r", "--repeat", type="int", dest="repeat", default=5,
+                  help="time the best of this many runs")
+    parser.add_option("-i", "--index", action="store_true", dest="index", default=False,
+                  help="parse with the document index")
+    parser.add_option("-o", "--output", dest="output",
+                  help="write the json results to this file (default stdout)")
+    options, arguments = parser.parse_args(argv[1:])
+    if arguments:
+        parser.error('Incorrect number of arguments')
+
+    names = options.scenarios or sorted(corpus.scenarios)
+    for name in names:
+        if name not in corpus.scenarios:
+            parser.error('unknown scenario: %s' % name)
+
+    results = []
+    for name in names:
+        queue = multiprocessing.Queue()
+        child = multiprocessing.Process(target=_run_in_child, args=(queue, name, options.scale, options.repeat, {'index': options.index}))
+        child.start()
+        result, error = queue.get()
+        child.join()
+        if error is not None:
+            sys.stderr.write('scenario %s failed:\n%s' % (name, error))
+            return 1
+        results.append(result)
+
+    report = {
+        'date': datetime.datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'lxml': lxml.etree.__version__,
+        'platform': platform.platform(),
+        'repeat': options.repeat,
+        'results': results,
+    }
+
+    out = open(options.output, 'w') if options.output else sys.stdout
+    json.dump(report, out, indent=2, sort_keys=True)
+    out.write('\n')
+
+if __name__ == '__main__':
+    sys.exit(main())
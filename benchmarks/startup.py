@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" benchmark how long a fresh process takes to get going with microtron
+
+Each run starts a new python, which imports microtron, loads the default
+schema and parses a tiny page, timing each step (after a first run, to
+byte-compile the modules). The best of several runs is written as json,
+for comparing over time:
+
+    python benchmarks/startup.py -o before.json
+"""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+_child = r'''
+import sys, time
+sys.path.insert(0, %r)
+start = time.time()
+modules = len(sys.modules)
+import microtron
+imported = time.time()
+microtron.default_schema()
+schema = time.time()
+microtron.parse('<div class="vcard"><span class="fn">Bob</span></div>', 'hcard')
+parsed = time.time()
+sys.stdout.write('%%r %%r %%r %%d' %% (imported - start, schema - imported, parsed - schema, len(sys.modules) - modules))
+'''
+
+
+def _run(python, code):
+    """wall time of running code in a new python, and what it printed"""
+    # let the modules be byte-compiled, or each run compiles them again
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    start = time.time()
+    output = subprocess.check_output([python, '-c', code], env=env)
+    return time.time() - start, output
+
+
+def measure(python, repeat):
+    baseline = min(_run(python, 'pass')[0] for i in range(repeat))
+    _run(python, _child % (root,))
+    runs = []
+    for i in range(repeat):
+        elapsed, output = _run(python, _child % (root,))
+        imported, schema, parsed, modules = output.split()
+        runs.append((elapsed, float(imported), float(schema), float(parsed), int(modules)))
+
+    return {
+        'baseline': baseline,
+        'process': min(run[0] for run in runs),
+        'import': min(run[1] for run in runs),
+        'schema': min(run[2] for run in runs),
+        'first_parse': min(run[3] for run in runs),
+        'modules_imported': runs[-1][4],
+    }
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+
+    parser = OptionParser('usage: %prog [options]')
+    parser.add_option("-p", "--python", dest="python", default=sys.executable,
+                  help="python interpreter to measure (default: this one)")
+    parser.add_option("-r", "--repeat", type="int", dest="repeat", default=10,
+                  help="time the best of this many runs")
+    parser.add_option("-o", "--output", dest="output",
+                  help="write the json results to this file (default stdout)")
+    options, arguments = parser.parse_args(argv[1:])
+    if arguments:
+        parser.error('Incorrect number of arguments')
+
+    version = subprocess.check_output([options.python, '-c', 'import platform, sys; sys.stdout.write(platform.python_version())'])
+    report = {
+        'date': datetime.datetime.utcnow().isoformat() + 'Z',
+        'python': version.decode('ascii'),
+        'platform': platform.platform(),
+        'repeat': options.repeat,
+        'results': measure(options.python, options.repeat),
+    }
+
+    out = open(options.output, 'w') if options.output else sys.stdout
+    json.dump(report, out, indent=2, sort_keys=True)
+    out.write('\n')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,40 +3,50 @@
 
 """ util to check microformat data (not quite validation ;-) """
 
-import lxml.etree, lxml.html
 from optparse import OptionParser
 import os
 import pprint
 import sys
 
 from microtron import *
+from microtron.batch import extract_many
 
 def parse(argv = None):
     if argv is None:
         argv = sys.argv
 
-    parser = OptionParser('usage: %prog <url> <format>')
-    parser.add_option("-s", "--strict",
-                  action="store_true", dest="strict", default=False,
-                  help="be strict about parsing")
+    parser = OptionParser('usage: %prog [options] <url>... <format>')
+    parser.add_option("-j", "--jobs",
+                  type="int", dest="jobs", default=0,
+                  help="check documents using N worker processes")
 
     options, arguments = parser.parse_args(argv[1:])
-    if len(arguments) != 2:
+    if len(arguments) < 2:
         parser.error('Incorrect number of arguments')
 
-    url = arguments[0]
-    format = arguments[1]
-
-    tree = lxml.html.parse( url )
-    parser = Parser( tree, strict=True, collect_errors=True )
-    data = parser.parse_format(format) 
-#    pprint.pprint(data)
-    print "%d errors:" % (len( parser.errors ) )
-
-    errs = parser.errors
-    errs.sort(lambda x, y: cmp(x.sourceline,y.sourceline))
-    for err in errs:
-        print "ERROR (line %d): %s" % (err.sourceline, err)
+    urls = arguments[:-1]
+    format = arguments[-1]
+
+    failed = 0
+    invalid = 0
+    total = 0
+    for doc in extract_many(urls, [format], workers=options.jobs, validate=True):
+        if len(urls) > 1:
+            print "%s:" % (doc.source,)
+        if doc.error:
+            print "FAILED: %s" % (doc.error,)
+            failed += 1
+            continue
+
+        print "%d errors:" % (len(doc.errors),)
+        for err in doc.errors:
+            print "ERROR (line %s): %s" % (err.sourceline, err)
+        if doc.errors:
+            invalid += 1
+            total += len(doc.errors)
+
+    if len(urls) > 1:
+        print "checked %d documents: %d errors in %d documents, %d failed" % (len(urls), total, invalid, failed)
 
     # TODO: extra checks for hnews:
     # - warn if dates insane (future, or distant past)
@@ -44,5 +54,8 @@ def parse(argv = None):
     # - concatenated authors in single vcard ("Bob Smith and Fred Bloggs")
     # - insanity in content (eg adverts, scripts....)
 
+    if failed or invalid:
+        return 1
+
 if __name__ == '__main__':
     sys.exit(parse())
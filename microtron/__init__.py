@@ -1,218 +1,1518 @@
-__import__('pkg_resources').declare_namespace(__name__)
-
-import isodate, re, os
+import re, os
 import lxml.etree
 import datetime
-import pytz
+import threading
+import bisect
+import copy
+import collections
+import time
+import keyword
+import hashlib
+
+try:
+    basestring
+except NameError:
+    # python 3
+    basestring = unicode = str
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 class ParseError(Exception):
     def __init__(self, message, sourceline=None):
         Exception.__init__(self, message)
         self.sourceline = sourceline
 
+    def __reduce__(self):
+        # keep the sourceline when errors are passed between processes
+        return (self.__class__, (self.args[0], self.sourceline))
+
+
+_whitespace = re.compile(r'[ \t\r\n]+')
+
+def _split_tokens(value):
+    """split an attribute value into tokens, as normalize-space() would"""
+    return _whitespace.sub(' ', value).strip(' ').split(' ')
+
+
+def _token_expr(axis, attribute, token):
+    """xpath expression selecting elements along axis whose attribute contains token"""
+    return '%s::*[contains(concat(" ", normalize-space(@%s), " "), " %s ")]' % (axis, attribute, token)
+
+
+class _cached(object):
+    """an attribute computed the first time it is used (eg. a compiled xpath)"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.__doc__ = fn.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.fn.__name__] = self.fn(obj)
+        return value
+
+
+def _lru_cache(size):
+    """memoize a single-argument function, keeping the most recent results"""
+    def decorator(fn):
+        cache = collections.OrderedDict()
+        lock = threading.Lock()
+
+        def wrapper(arg):
+            with lock:
+                if arg in cache:
+                    value = cache.pop(arg)
+                    cache[arg] = value
+                    return value
+            value = fn(arg)
+            with lock:
+                cache[arg] = value
+                if len(cache) > size:
+                    cache.popitem(last=False)
+            return value
+
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+class _Definition(object):
+    """an mf.xml element, as stored in the generated _mfdata module"""
+
+    def __init__(self, tag, attrib, children):
+        self.tag = tag
+        self.attrib = attrib
+        self.children = tuple(_Definition(*child) for child in children)
+
+    def get(self, name, default=None):
+        return self.attrib.get(name, default)
+
+    def __iter__(self):
+        return iter(self.children)
+
+
+class Property(object):
+    """a single property (or elemental feature) definition, compiled from mf.xml"""
+
+    def __init__(self, element):
+        self.name = element.tag
+        self.type = element.get('type', 'text')
+        self.mandatory = element.get('mandatory') == 'yes'
+        self.attribute = element.get('attribute', 'class')
+        self.many = element.get('many', False)
+        self.couldbe = tuple(element.attrib['couldbe'].split('|')) if 'couldbe' in element.attrib else ()
+        self.values = frozenset(element.attrib['values'].split(',')) if 'values' in element.attrib else None
+        self.separator = element.get('separator', "")
+        # formats to parse in place of the named couldbe/type ones (see Schema.project)
+        self.subformats = {}
+
+        # properties with child definitions are compound properties
+        children = [child for child in element if isinstance(child.tag, basestring)]
+        self.format = Format(element) if children else None
+
+    @_cached
+    def find(self):
+        return lxml.etree.XPath(_token_expr('descendant-or-self', self.attribute, self.name))
+
+
+class Format(object):
+    """a microformat (or compound property) definition, compiled from mf.xml"""
+
+    def __init__(self, element):
+        self.tag = element.tag
+        self.name = element.get('name', element.tag)
+        self.type = element.get('type')
+        self._set_properties(Property(child) for child in element if isinstance(child.tag, basestring))
+
+    @_cached
+    def find_roots(self):
+        return lxml.etree.XPath(_token_expr('descendant-or-self', 'class', self.tag))
+
+    @_cached
+    def find_parent(self):
+        """nearest enclosing element of this format"""
+        # (ancestor axis counts backwards)
+        return lxml.etree.XPath(_token_expr('ancestor', 'class', self.tag) + '[1]')
+
+    @_cached
+    def extractor(self):
+        """function parsing this format, generated from its definition (see microtron.compiler)"""
+        from microtron.compiler import compile_format
+        return compile_format(self)
+
+    def _set_properties(self, properties):
+        self.properties = tuple(properties)
+        # (a projection mustn't keep the extractor of the format it was copied from)
+        self.__dict__.pop('extractor', None)
+        # the definitions for each property name, in document order
+        self.properties_by_name = collections.OrderedDict()
+        for prop in self.properties:
+            self.properties_by_name.setdefault(prop.name, []).append(prop)
+
+
+class Schema(object):
+    """compiled set of microformat definitions
+
+    Built once from an mf.xml tree and never modified afterwards, so a
+    single Schema can be shared between Parser instances (and threads).
+    """
+
+    def __init__(self, tree):
+        self._tree = tree
+        root = tree.getroot() if hasattr(tree, 'getroot') else tree
+        # identifies these definitions, eg. for invalidating cached results
+        self._compile(root, hashlib.sha1(lxml.etree.tostring(root)).hexdigest())
+
+    @classmethod
+    def _from_data(cls, data, filename):
+        """a Schema from the definitions in a generated module (see microtron.schemagen)"""
+        schema = cls.__new__(cls)
+        schema._tree = None
+        schema._filename = filename
+        schema._compile(_Definition('microformats', {}, data.formats), data.version)
+        return schema
+
+    @property
+    def tree(self):
+        """the mf.xml tree the definitions came from"""
+        if self._tree is None:
+            self._tree = lxml.etree.parse(self._filename)
+        return self._tree
+
+    def _compile(self, root, version):
+        self.version = version
+        self.formats = tuple(Format(element) for element in root if isinstance(element.tag, basestring))
+
+        # formats can be looked up by name or by tag, first definition wins
+        self._lookup = {}
+        for format in self.formats:
+            self._lookup.setdefault(format.name, format)
+            self._lookup.setdefault(format.tag, format)
+
+        # formats pruned by project(), kept so they are only built once
+        self._projections = {}
+
+    @_cached
+    def attributes(self):
+        """every attribute the definitions look for tokens in"""
+        attributes = set(['class'])
+        formats = list(self.formats)
+        while formats:
+            format = formats.pop()
+            for prop in format.properties:
+                attributes.add(prop.attribute)
+                if prop.format is not None:
+                    formats.append(prop.format)
+        return tuple(sorted(attributes))
+
+    @_cached
+    def find_elemental(self):
+        """elements which could carry a feature of any elemental format"""
+        attributes = sorted(set(feature.attribute for format in self.formats if format.type == 'elemental' for feature in format.properties))
+        return lxml.etree.XPath('descendant-or-self::*[%s]' % ' or '.join('@' + attribute for attribute in attributes) if attributes else 'self::*[false()]')
+
+    def __contains__(self, mf):
+        return mf in self._lookup
+
+    def get(self, mf):
+        if isinstance(mf, Format):
+            return mf
+        try:
+            return self._lookup[mf]
+        except KeyError:
+            raise Exception( "unknown format '%s'" % (mf) )
+
+    def project(self, mf, fields):
+        """a copy of format mf which only has the given properties
+
+        fields are property names, or dotted paths to the properties of
+        nested formats (eg. 'author.fn' in hentry, 'n.family-name' in
+        vcard). A property named on its own is kept whole. A nested format
+        with none of the requested properties is treated as one with no
+        properties at all (so the value falls back to text, as usual).
+        """
+        format = self.get(mf)
+        if format.type != 'compound':
+            raise Exception("can only project compound formats, not '%s'" % (format.name))
+        key = (format, frozenset(fields))
+        if key not in self._projections:
+            self._projections.setdefault(key, self._project(format, fields))
+        return self._projections[key]
+
+    def _project(self, format, fields):
+        paths = {}
+        for field in fields:
+            name, _, rest = field.partition('.')
+            if name not in format.properties_by_name:
+                raise Exception("unknown %s property '%s'" % (format.tag, name))
+            paths.setdefault(name, set()).add(rest)
+
+        properties = []
+        for prop in format.properties:
+            if prop.name not in paths:
+                continue
+            if '' in paths[prop.name]:
+                properties.append(prop)
+            else:
+                properties.append(self._project_property(prop, paths[prop.name]))
+
+        projected = copy.copy(format)
+        projected._set_properties(properties)
+        return projected
+
+    def _project_property(self, prop, fields):
+        projected = copy.copy(prop)
+        projected.subformats = {}
+        if prop.format is not None:
+            projected.format = self._project(prop.format, self._known(prop.format, fields))
+        for mf in prop.couldbe + (prop.type,):
+            if mf in self and self.get(mf).type == 'compound':
+                projected.subformats[mf] = self._project(self.get(mf), self._known(self.get(mf), fields))
+
+        formats = [projected.format] if projected.format is not None else []
+        formats += projected.subformats.values()
+        for field in fields:
+            name = field.partition('.')[0]
+            if not [format for format in formats if name in format.properties_by_name]:
+                raise Exception("unknown %s property '%s'" % (prop.name, name))
+        return projected
+
+    def _known(self, format, fields):
+        """those of fields which are properties of format"""
+        return [field for field in fields if field.partition('.')[0] in format.properties_by_name]
+
+    def to_record(self, result, format):
+        """convert a result dict of format (as from Parser) to Records"""
+        if '__srcline__' in result:
+            return self._value_record(result)
+        if format.type == 'elemental':
+            return self._record(result, result['__type__'], ('value', 'href', 'text'), None)
+
+        # couldbe results can be several formats merged together
+        formats = []
+        for tag in result['__type__'].split(' '):
+            formats.append(format if tag == format.tag else self.get(tag))
+
+        fields = []
+        props = {}
+        for f in formats:
+            for prop in f.properties:
+                if prop.name not in props:
+                    props[prop.name] = prop
+                    fields.append(prop.name)
+        return self._record(result, result['__type__'], tuple(fields), props)
+
+    def _value_record(self, result):
+        fields = _value_fields.get(result['__type__'])
+        if fields is None:
+            return result
+        return self._record(result, result['__type__'], ('__srcline__',) + fields, None)
+
+    def _record(self, result, record_type, fields, props):
+        cls = record_class(record_type, fields)
+        record = cls.__new__(cls)
+        for key, value in result.items():
+            if key == '__type__':
+                continue
+            attribute = cls._attributes.get(key)
+            if attribute is None:
+                return result   # not something we know how to convert
+            if props is not None:
+                value = self._property_record(value, props[key])
+            setattr(record, attribute, value)
+        return record
+
+    def _property_record(self, value, prop):
+        if isinstance(value, list):
+            return [self._property_record(item, prop) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if '__srcline__' in value:
+            return self._value_record(value)
+        # a sub-format, a compound property, or several merged together
+        return self.to_record(value, prop.format or self.get(value['__type__'].split(' ')[0]))
+
+
+# the keys of each type of value dict, other than __type__ and __srcline__
+_value_fields = {
+    'url': ('text', 'href', 'mailto', 'tel', 'fax', 'modem'),
+    'email': ('text', 'href', 'mailto', 'tel', 'fax', 'modem'),
+    'image': ('title', 'alt', 'src'),
+    'object': ('text', 'data'),
+    'date': ('text', 'date'),
+    'datetime': ('text', 'datetime'),
+}
+
+_missing = object()
+
+
+class Record(object):
+    """compact, slotted parse result (see Parser's records argument)
+
+    Each format (and each combination of formats) gets its own Record
+    subclass, with a slot for each of its properties. Properties are
+    attributes, with '-' replaced by '_' (and '_' appended to python
+    keywords, eg. record.class_), and can also be read by their mf.xml
+    names, as with the dicts Parser returns by default: record['family-name'].
+    """
+    __slots__ = ()
+    __type__ = None
+    _fields = ()        # property names, in mf.xml order
+    _attributes = {}    # property name -> attribute name
+
+    def __getitem__(self, key):
+        value = getattr(self, self._attributes.get(key, '__missing__'), _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def get(self, key, default=None):
+        return getattr(self, self._attributes.get(key, '__missing__'), default)
+
+    def keys(self):
+        return [key for key in self._fields if key in self]
+
+    def to_dict(self):
+        """the result as Parser would have returned it without records"""
+        result = {'__type__': self.__type__}
+        for key in self._fields:
+            value = getattr(self, self._attributes[key], _missing)
+            if value is not _missing:
+                result[key] = _to_dict(value)
+        return result
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.to_dict())
+
+    def __reduce__(self):
+        # record classes are generated, so can't be pickled by name
+        values = {}
+        for key in self._fields:
+            value = getattr(self, self._attributes[key], _missing)
+            if value is not _missing:
+                values[key] = value
+        return (_unpickle_record, (self.__type__, self._fields, values))
+
+
+def _to_dict(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+    return value
+
+
+def _attribute_name(key):
+    name = key.replace('-', '_')
+    if keyword.iskeyword(name) or name == 'get' or name == 'keys':
+        name += '_'
+    return name
+
+
+# Record classes, generated as they are needed
+_record_classes = {}
+_record_lock = threading.Lock()
+
+def record_class(record_type, fields):
+    """the Record class for results of record_type with the given fields"""
+    key = (record_type, fields)
+    cls = _record_classes.get(key)
+    if cls is None:
+        with _record_lock:
+            cls = _record_classes.get(key)
+            if cls is None:
+                attributes = dict((field, _attribute_name(field)) for field in fields)
+                name = ''.join(_attribute_name(tag).title().replace('_', '') for tag in record_type.split(' ')) + 'Record'
+                cls = type(str(name), (Record,), {
+                    '__slots__': tuple(attributes[field] for field in fields),
+                    '__type__': record_type,
+                    '_fields': fields,
+                    '_attributes': attributes,
+                })
+                _record_classes[key] = cls
+    return cls
+
+
+def _unpickle_record(record_type, fields, values):
+    cls = record_class(record_type, fields)
+    record = cls.__new__(cls)
+    for key, value in values.items():
+        setattr(record, cls._attributes[key], value)
+    return record
+
+
+class LazyResult(Mapping):
+    """a compound result whose properties are parsed when first looked up
+
+    Returned by Parser.parse_format() when the parser was created with
+    lazy=True. Looking up a property parses just that property, so the
+    ones which are never used cost nothing; iterating over the result (or
+    asking for its length) parses them all. The parser, and with it the
+    document and schema, is kept until every property has been resolved.
+    Errors are raised (or collected) as the properties are resolved.
+
+    materialize() gives a plain dict of the whole result, which is also
+    what gets pickled or copied.
+    """
+
+    def __init__(self, parser, node, format):
+        self._parser = parser
+        self._node = node
+        self._format = format
+        self._values = {'__type__': format.tag}
+        self._pending = set(format.properties_by_name)
+
+    def _resolve(self, name):
+        if name not in self._pending:
+            return
+        self._pending.discard(name)
+        for prop in self._format.properties_by_name[name]:
+            value = self._parser._parse_property(self._node, self._format, prop)
+            if value is not _missing:
+                self._values[name] = value
+        if not self._pending:
+            # nothing more to parse, let go of the document
+            self._parser = self._node = None
+
+    def __getitem__(self, name):
+        self._resolve(name)
+        return self._values[name]
+
+    def __contains__(self, name):
+        self._resolve(name)
+        return name in self._values
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __len__(self):
+        return len(self.materialize())
+
+    def materialize(self):
+        """parse any unresolved properties, returning the result as a dict"""
+        for name in self._format.properties_by_name:
+            self._resolve(name)
+        return dict(self._values)
+
+    def __repr__(self):
+        return '<LazyResult %s, %d of %d properties resolved>' % (self._format.tag,
+            len(self._format.properties_by_name) - len(self._pending), len(self._format.properties_by_name))
+
+    def __reduce__(self):
+        return (dict, (self.materialize(),))
+
+
+class DocumentIndex(object):
+    """index of the class/rel/rev (or other attribute) tokens in a document, built in one pass
+
+    Maps each (attribute, token) pair to the elements carrying it, in
+    document order, along with the extent of every element's subtree, so
+    finding the descendants of a node with a given token is a bisect
+    rather than an xpath scan over the whole subtree.
+    """
+    attributes = ('class', 'rel', 'rev')
+
+    def __init__(self, tree, attributes=None):
+        """index the tokens of attributes (default: class, rel and rev)
+
+        class is always indexed, as format roots are found by it.
+        """
+        root = tree.getroot() if hasattr(tree, 'getroot') else tree
+        if attributes is not None:
+            self.attributes = ('class',) + tuple(sorted(set(attributes) - set(['class'])))
+        self._elements = {}     # (attribute, token) -> [element, ...]
+        self._positions = {}    # (attribute, token) -> [position, ...]
+        self._extent = {}       # element -> (first, last) position of its subtree
+        self._enclosing = {}    # (element, token) -> nearest ancestor with class token
+        self._members = {}      # token -> set of elements with class token
+
+        position = 0
+        stack = []
+        for event, element in lxml.etree.iterwalk(root, events=('start', 'end'), tag=lxml.etree.Element):
+            if event == 'start':
+                stack.append(position)
+                for attribute in self.attributes:
+                    value = element.get(attribute)
+                    if not value:
+                        continue
+                    for token in set(_split_tokens(value)):
+                        key = (attribute, token)
+                        if key not in self._elements:
+                            self._elements[key] = []
+                            self._positions[key] = []
+                        self._elements[key].append(element)
+                        self._positions[key].append(position)
+                position += 1
+            else:
+                self._extent[element] = (stack.pop(), position - 1)
+
+    def covers(self, node):
+        return node in self._extent
+
+    def indexes(self, attributes):
+        """whether the tokens of all of attributes are indexed"""
+        return all(attribute in self.attributes for attribute in attributes)
+
+    def find(self, node, attribute, token):
+        """elements under (or at) node whose attribute contains token"""
+        key = (attribute, token)
+        if key not in self._elements:
+            return []
+        first, last = self._extent[node]
+        positions = self._positions[key]
+        return self._elements[key][bisect.bisect_left(positions, first):bisect.bisect_right(positions, last)]
+
+    def find_any(self, node, attribute, tokens):
+        """elements under (or at) node whose attribute contains any of tokens, in document order"""
+        if len(tokens) == 1:
+            return self.find(node, attribute, tokens[0])
+        found = {}
+        for token in tokens:
+            for element in self.find(node, attribute, token):
+                found[self._extent[element][0]] = element
+        return [found[position] for position in sorted(found)]
+
+    def enclosing(self, element, token):
+        """nearest ancestor of element with class token, or None"""
+        key = (element, token)
+        if key not in self._enclosing:
+            parent = None
+            if token not in self._members:
+                self._members[token] = set(self._elements.get(('class', token), ()))
+            candidates = self._members[token]
+            if candidates:
+                for ancestor in element.iterancestors():
+                    if ancestor in candidates:
+                        parent = ancestor
+                        break
+            self._enclosing[key] = parent
+        return self._enclosing[key]
+
+
+# the most precise clock available for measuring intervals
+_timer = getattr(time, 'perf_counter', None) or (time.clock if os.name == 'nt' else time.time)
+
+
+class ParserStats(object):
+    """counts and cumulative timings of the work done by a Parser
+
+    Pass one to Parser(stats=...). Events recorded are:
+
+        find_roots, find_props  -- format root and property lookups (xpath or index)
+        find_value_nodes        -- value-class-pattern lookups
+        parse_text              -- normalize-space() text extraction
+        index                   -- building the document index
+        parse_node, parse_node:<format> -- parsing a node as a format (inclusive)
+        datetime                -- parsing date/datetime values
+        elemental               -- single-pass searches for elemental formats
+        couldbe                 -- attempts to parse a property as a "couldbe" format
+        couldbe_failed, compound_failed -- exceptions swallowed by those attempts
+        fallback                -- non-strict fallback to a plain text value
+        error                   -- ParseErrors raised or collected
+
+    callback -- if given, called as callback(event, elapsed) for every
+                event, eg. to feed a metrics system
+
+    One ParserStats can be shared by parsers running in several threads.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = collections.defaultdict(int)
+        self.times = collections.defaultdict(float)
+
+    def record(self, event, elapsed=0.0):
+        with self._lock:
+            self.counts[event] += 1
+            self.times[event] += elapsed
+        if self.callback is not None:
+            self.callback(event, elapsed)
+
+    def timed(self, event, fn):
+        """wrap fn so that each call is recorded as event"""
+        def wrapper(*args):
+            start = _timer()
+            try:
+                return fn(*args)
+            finally:
+                self.record(event, _timer() - start)
+        return wrapper
+
+    def as_dict(self):
+        return {'counts': dict(self.counts), 'times': dict(self.times)}
+
+
+_default_schema = None
+_default_schema_lock = threading.Lock()
+
+def default_schema():
+    """the Schema for the bundled mf.xml, loaded on first use"""
+    global _default_schema
+    if _default_schema is None:
+        with _default_schema_lock:
+            if _default_schema is None:
+                path = os.path.abspath(os.path.dirname(__file__))
+                fname = os.path.join(path, 'mf.xml')
+                _default_schema = _load_schema(fname)
+    return _default_schema
+
+def _load_schema(fname):
+    """the Schema for the mf.xml file fname, from the generated module if it's up to date"""
+    try:
+        from microtron import _mfdata
+    except ImportError:
+        _mfdata = None
+    if _mfdata is not None:
+        with open(fname, 'rb') as f:
+            if hashlib.sha1(f.read()).hexdigest() == _mfdata.source:
+                return Schema._from_data(_mfdata, fname)
+    return Schema(lxml.etree.parse(fname))
+
+
+def get_schema(formats):
+    """the Schema for formats, as passed to Parser"""
+    if formats is None:
+        return default_schema()
+    elif isinstance(formats, Schema):
+        return formats
+    else:
+        return _tree_schema(formats.getroot() if hasattr(formats, 'getroot') else formats)
+
+@_lru_cache(16)
+def _tree_schema(root):
+    """the Schema for an mf.xml tree, so each tree is only compiled once
+
+    (lxml trees can't be weakly referenced, so the most recently used
+    ones are kept instead.) Changes made to a tree after it was first
+    used aren't seen.
+    """
+    return Schema(root.getroottree() if root.getparent() is None else root)
+
+
+# lxml parsers keep state while parsing, so each thread gets its own
+_parsers = threading.local()
+
+def _get_parser(backend):
+    if not isinstance(backend, basestring):
+        return backend      # already an lxml parser
+    parser = getattr(_parsers, backend, None)
+    if parser is None:
+        if backend == 'html':
+            from lxml.html import HTMLParser
+            parser = HTMLParser(remove_comments=True)
+        elif backend == 'xml':
+            parser = lxml.etree.XMLParser(remove_comments=True)
+        else:
+            raise Exception( "unknown parser backend '%s'" % (backend) )
+        setattr(_parsers, backend, parser)
+    return parser
+
+def load(source, backend='html'):
+    """load a document, ready to be passed to Parser
+
+    source  -- a filename, a file or http url, a file-like object, or the
+               document itself as a string (anything containing a '<').
+               Trees and elements are returned unchanged.
+    backend -- 'html', 'xml', or an lxml parser instance to use. The
+               'html' and 'xml' parsers are created once per thread and
+               reused.
+    """
+    if hasattr(source, 'getroot') or lxml.etree.iselement(source):
+        return source
+    parser = _get_parser(backend)
+    if isinstance(source, (bytes, bytearray)) and b'<' in source or isinstance(source, unicode) and u'<' in source:
+        if isinstance(source, bytearray):
+            source = bytes(source)
+        return lxml.etree.fromstring(source, parser).getroottree()
+    return lxml.etree.parse(source, parser)
+
+def parse(source, mf, backend='html', cache=None, **options):
+    """load source (see load()) and parse the microformat mf from it
+
+    cache   -- a store from microtron.cache to look the results up in
+               first, and to save them to after parsing
+    options are passed on to Parser (formats, strict, collect_errors, ...)
+    """
+    if cache is not None:
+        from microtron.cache import cached_parse
+        return cached_parse(source, mf, cache, backend, **options)
+    return Parser(load(source, backend), **options).parse_format(mf)
+
+def _copy_result(value):
+    """copy of a result, down to (but not including) its strings and dates"""
+    if isinstance(value, dict):
+        return dict((key, _copy_result(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_copy_result(item) for item in value]
+    return value
+
+def _shift_sourcelines(value, delta):
+    """copy of a result, with its __srcline__s moved on by delta lines"""
+    if isinstance(value, dict):
+        value = dict((key, _shift_sourcelines(item, delta)) for key, item in value.items())
+        if value.get('__srcline__') is not None:
+            value['__srcline__'] += delta
+        return value
+    if isinstance(value, list):
+        return [_shift_sourcelines(item, delta) for item in value]
+    return value
+
+
+# value-class-pattern date and time parsing
+#
+# The patterns are compiled once (on first use), fragments are dispatched on
+# their first character to the only pattern that could match them, and
+# results are kept in a small LRU cache since the same timestamps tend to
+# repeat throughout a page or feed.
+
+_tzpat = r'(?P<tzname>(?:(?P<tzsign>[-+])(?:(?P<tzhour>\d{1,2})[:]?(?P<tzmin>\d\d)))|(?P<tzzulu>Z))'
+_timepat = r'(?P<hour>\d{1,2})[:](?P<min>\d\d)(?:[:](?P<sec>\d\d))?'
+_ampmpat = r'(?:(?P<am>am|a[.]m[.])|(?P<pm>pm|p[.]m[.]))'
+
+class _lazy_re(object):
+    """a regular expression, compiled when it's first used (to keep imports quick)"""
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+        self._re = None
+
+    def match(self, txt):
+        if self._re is None:
+            self._re = re.compile(self.pattern, self.flags)
+        return self._re.match(txt)
+
+
+_tz_re = _lazy_re('^' + _tzpat + '$', re.IGNORECASE)
+_time_re = _lazy_re('^' + _timepat + _ampmpat + '?' + _tzpat + '?$', re.IGNORECASE)
+_hour_re = _lazy_re(r'^(?P<hour>\d{1,2})' + _ampmpat + '?$', re.IGNORECASE)      # HHam and HHpm
+_date_re = _lazy_re(r'^(?P<year>\d\d\d\d)-(?P<month>\d\d)-(?P<day>\d\d)$')      # YYYY-MM-DD
+_orddate_re = _lazy_re(r'^(?P<year>\d\d\d\d)-(?P<ordinalday>\d\d\d)$')            # YYYY-DDD   -Ordinal date
+# YYYY-MM-DDTtime or YYYY-DDDTtime, in one go
+_datetime_re = _lazy_re(r'^(?P<year>\d\d\d\d)-(?:(?P<month>\d\d)-(?P<day>\d\d)|(?P<ordinalday>\d\d\d))T' + _timepat + _ampmpat + '?' + _tzpat + '?$', re.IGNORECASE)
+
+_digits = frozenset('0123456789')
+
+
+@_lru_cache(1024)
+def _eval_as_tzinfo(txt):
+    """try and parse a timezone, as per value-class-pattern rules"""
+    m = _tz_re.match(txt)
+    if m:
+        return _compose_tzinfo(m.groupdict())
+    # TODO: special case for timezones "-XX" "+XX"
+    return None
+
+
+@_lru_cache(1024)
+def _eval_as_time(txt):
+    """try and parse a time, as per value-class-pattern rules"""
+    # looking for time or time+timezone
+    m = _time_re.match(txt)
+    if m:
+        return _compose_time(m.groupdict())
+
+    # special case for HHam and HHpm
+    m = _hour_re.match(txt)
+    if m:
+        return _compose_time(m.groupdict())
+    return None
+
+
+@_lru_cache(1024)
+def _eval_as_date(txt):
+    """try and parse a date, as per value-class-pattern rules"""
+    m = _date_re.match(txt) or _orddate_re.match(txt)
+    if m:
+        return _compose_date(m.groupdict())
+    return None
+
+
+@_lru_cache(1024)
+def _eval_as_datetime(txt):
+    if 'T' not in txt:
+        return None
+    m = _datetime_re.match(txt)
+    if m:
+        g = m.groupdict()
+        return datetime.datetime.combine(_compose_date(g), _compose_time(g))
+
+    # the less usual forms, eg. YYYY-MM-DDTHHam
+    parts = txt.split('T')
+    if len(parts) != 2:
+        return None
+    date = _eval_as_date(parts[0])
+    time = _eval_as_time(parts[1])
+    if date is None or time is None:
+        return None
+    return datetime.datetime.combine( date, time )
+
+
+def _eval_datetime_fragment(txt):
+    """classify a value-class-pattern fragment as a timezone, time or date
+
+    returns a (kind, value) pair, where kind is 'tzinfo', 'time', 'date'
+    or None if the fragment isn't usable
+    """
+    first = txt[:1]
+    if first in _digits:
+        # dates are YYYY-MM-DD or YYYY-DDD (but H:MM-XXYY is a time)
+        if txt[4:5] == '-':
+            obj = _eval_as_date(txt)
+            if obj is not None:
+                return 'date', obj
+        obj = _eval_as_time(txt)
+        if obj is not None:
+            return 'time', obj
+    elif first:
+        obj = _eval_as_tzinfo(txt)
+        if obj is not None:
+            return 'tzinfo', obj
+    return None, None
+
+
+class _FixedOffset(datetime.tzinfo):
+    """a fixed offset from UTC (for pythons without datetime.timezone)"""
+
+    def __init__(self, offset, name):
+        self._offset = offset
+        self._name = name
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+    def tzname(self, dt):
+        return self._name
+
+    def __getinitargs__(self):
+        return (self._offset, self._name)
+
+    def __repr__(self):
+        return '<_FixedOffset %s>' % (self._name,)
+
+
+_tzinfos = {}
+
+def _fixed_offset(minutes, name):
+    """the tzinfo for an offset of minutes from UTC, shared by all the times using it"""
+    key = (minutes, name)
+    tzinfo = _tzinfos.get(key)
+    if tzinfo is None:
+        if not -24 * 60 < minutes < 24 * 60:
+            raise ValueError("timezone offset out of range: %s" % (name,))
+        offset = datetime.timedelta(minutes=minutes)
+        if not hasattr(datetime, 'timezone'):
+            tzinfo = _FixedOffset(offset, name)
+        elif key == (0, 'UTC'):
+            tzinfo = datetime.timezone.utc
+        else:
+            tzinfo = datetime.timezone(offset, name)
+        tzinfo = _tzinfos.setdefault(key, tzinfo)
+    return tzinfo
+
+
+def _compose_tzinfo(g):
+    """build a tzinfo from extracted parts"""
+    if g.get('tzname') is None:
+        return None
+
+    if g['tzzulu'] is not None:
+        return _fixed_offset(0, 'UTC')
+
+    tzsign = ((g['tzsign'] == '-') and -1) or 1
+    tzhour = int(g['tzhour'])
+    tzmin = 0
+    if g['tzmin']:
+        tzmin = int(g['tzmin'])
+    return _fixed_offset(tzsign * (tzhour * 60 + tzmin), g['tzname'])
+
+
+def _compose_time(g):
+    """build a time object from extracted parts"""
+    # get time
+    hour = int(g['hour'])
+
+    min=0
+    if g.get('min') is not None:
+        min = int(g['min'])
+
+    sec=0
+    if g.get('sec') is not None:
+        sec = int( g['sec'] )
+
+    if g['am'] is not None:
+        if hour==12:
+            hour = 0
+    elif g['pm'] is not None:
+        if hour < 12:
+            hour += 12
+    if hour==24:
+        hour = 0
+
+    # get timezone, if any
+    tzinfo = _compose_tzinfo(g)
+
+    return datetime.time(hour, min, sec, 0, tzinfo )
+
+
+def _compose_date(g):
+    """build a date object from extracted parts"""
+    if g.get('month') is not None:
+        return datetime.date(int(g['year']), int(g['month']), int(g['day']))
+    else:
+        # ordinal date YYYY-DDD
+        return datetime.date(int(g['year']),1,1 ) + datetime.timedelta(days=int(g['ordinalday'])-1)
+
+
+
 class Parser(object):
-    def __init__(self, tree, formats=None, strict=False, collect_errors=False):
+
+    # how memoized results are copied before being handed out
+    _copy_result = staticmethod(_copy_result)
+    def __init__(self, tree, formats=None, strict=False, collect_errors=False, index=False, memoize=True, stats=None, records=False, lazy=False, compiled=False):
         """set up parser
 
         tree    -- the document that we are going to parse
-        formats -- the microformat definitions (if None, load from mf.xml)
+        formats -- the microformat definitions, either a Schema or an
+                   mf.xml tree (if None, use the bundled mf.xml)
         strict  -- if True, parser will be in pedantic try-to-follow-the-specs mode.
                    if False, parser aims to be loose enough for real-world use
         collect_errors -- collect parsing errors rather than raising them
                    as exceptions, and try to continue parsing
+        index   -- if True, index the document's class/rel/rev tokens in a
+                   single pass on first use, and look properties up in the
+                   index instead of running an xpath scan for each one
+        memoize -- remember the result of parsing each element as a nested
+                   format, so nested formats reached from several places
+                   (e.g. a vcard that is both an hentry author and a
+                   top-level hcard) are only parsed once per document
+        stats   -- a ParserStats to record counts and timings in. Parsers
+                   without one aren't instrumented at all.
+        records -- if True, return results as compact Record objects rather
+                   than dicts (see Record)
+        lazy    -- if True, return compound results whose properties are only
+                   parsed when they are looked up (see LazyResult)
+        compiled -- if True, parse each format with a function generated
+                   from its definition (see microtron.compiler) rather
+                   than by interpreting the definition property by property
         """
+        if records and lazy:
+            raise ValueError("records and lazy results can't be combined")
         self.root = tree
-        self.formats = formats
         self.strict = strict
         self.collect_errors = collect_errors
         self.errors = []
-        if formats is None:
-            path = os.path.abspath(os.path.dirname(__file__))
-            fname = os.path.join(path, 'mf.xml')
-            self.formats = lxml.etree.parse(fname)
+        self.schema = get_schema(formats)
+        self.use_index = index
+        self.index = None
+        self.memoize = memoize
+        self._results = {}
+        self._texts = {}
+        self.stats = stats
+        if stats is not None:
+            self._instrument()
+        self.records = records
+        self.lazy = lazy
+        self.compiled = compiled
+
+    @property
+    def formats(self):
+        """the mf.xml tree of the microformat definitions"""
+        return self.schema.tree
+
+    def parse_format(self, mf, root=None, fields=None):
+        """parse all the instances of format mf in the document
+
+        fields -- if given, only parse these properties (see Schema.project);
+                  the others, and any nested formats they would need, are
+                  never looked at
+        """
+        if fields is not None:
+            mf = self.schema.project(mf, fields)
+
+        if self.lazy:
+            format = self.schema.get(mf)
+            if format.type == 'compound':
+                root = root if root is not None else self.root
+                return [LazyResult(self, node, format) for node in self._find(root, 'class', format.tag, format.find_roots)]
+
+        results = self._parse_format(mf, root, False)
+        if self.records:
+            format = self.schema.get(mf)
+            results = [self.schema.to_record(result, format) for result in results]
+        return results
 
-    def parse_format(self, mf, root=None):
+    def _parse_format(self, mf, root=None, store=True):
         root = root if root is not None else self.root
-        format = self.formats.xpath('/microformats/*[@name="%s"] | /microformats/%s' % (mf, mf))
-        if not format:
-            raise Exception( "unknown format '%s'" % (mf) )
-        else:
-            format = format[0]
+        format = self.schema.get(mf)
 
         results = []
-        if format.attrib['type'] == 'compound':
-            expr = 'descendant-or-self::*[contains(concat(" ", normalize-space(@class), " "), " %s ")]' % format.tag
-            for node in root.xpath(expr):
-                results.append(self._parse_node(node, format))
+        if format.type == 'compound':
+            for node in self._find(root, 'class', format.tag, format.find_roots):
+                results.append(self._parse_node(node, format, store))
+
+        elif format.type == 'elemental':
+            results = self._parse_elemental([mf], root)[mf]
 
-        elif format.attrib['type'] == 'elemental':
-            for feature in format:
-                attribute = feature.attrib['attribute']
-                value = feature.tag
-                expr = 'descendant-or-self::*[contains(concat(" ", normalize-space(@%s), " "), " %s ")]' % (attribute, value)
+        return results
 
-                for node in root.xpath(expr):
-                    results.append({'__type__': mf, 'value': value, 'href': node.attrib['href'], 'text': node.text})
+    def parse_elemental(self, mfs=None, root=None):
+        """parse several elemental formats (rel-tag, xfn, ...) at once
 
+        Rather than searching the document for each feature of each
+        format, the elements with rel/rev attributes are visited once and
+        matched against all of the features together.
+
+        mfs -- the elemental formats to parse (default: all of them)
+        returns a dict of results keyed by format
+        """
+        if mfs is None:
+            mfs = [format.name for format in self.schema.formats if format.type == 'elemental']
+        results = self._parse_elemental(mfs, root)
+        if self.records:
+            for mf in mfs:
+                format = self.schema.get(mf)
+                results[mf] = [self.schema.to_record(result, format) for result in results[mf]]
         return results
 
-    def _parse_node(self, node, format):
-        result = {'__type__': format.tag}
-        for prop in format:
-            prop_name = prop.tag
-            prop_type = prop.attrib['type'] if 'type' in prop.attrib else 'text'
-            prop_mandatory = True if 'mandatory' in prop.attrib and prop.attrib['mandatory'] == 'yes' else False
-            prop_attr = prop.attrib['attribute'] if 'attribute' in prop.attrib else 'class'
-            prop_many = prop.attrib['many'] if 'many' in prop.attrib else False
-            prop_couldbe = prop.attrib['couldbe'].split('|') if 'couldbe' in prop.attrib else []
-            prop_values = set(prop.attrib['values'].split(',')) if 'values' in prop.attrib else None
-            prop_separator = prop.attrib['separator'] if 'separator' in prop.attrib else ""
-            
-            # Select all properties, but exclude nested properties
-            prop_expr = 'descendant-or-self::*[contains(concat(" ", normalize-space(@%s), " "), " %s ")]' % (prop_attr, prop_name)
-            parent_expr = 'ancestor::*[contains(concat(" ", normalize-space(@class), " "), " %s ")]' % format.tag
-            prop_nodes = [prop_node for prop_node in node.xpath(prop_expr) if prop_node.xpath(parent_expr)[0] == node]
-
-            # missing something required?
-            if self.strict and not prop_nodes and prop_mandatory:
-                err = ParseError("missing mandatory %s property: %s" % (format.tag, prop_name), node.sourceline)
-                if self.collect_errors:
-                    self.errors.append(err)
-                    continue
-                else:
-                    raise err
+    def _parse_elemental(self, mfs, root=None):
+        results = dict((mf, []) for mf in mfs)
+        for mf, value, nodes in self._find_elemental(mfs, root):
+            results[mf].extend({'__type__': mf, 'value': value, 'href': node.get('href'), 'text': node.text} for node in nodes)
+        return results
 
-            if prop_many == 'many':
-                values = []
-            elif prop_many == 'manyasone':
-                values = ""
-
-            # for each node matching the property we're looking for...
-            for prop_node in prop_nodes:
-                try:
-                    # Check if this prop_node is one or more of the possible "could be" formats
-                    value = {}
-                    for mf in prop_couldbe:
-                        try:
-                            format_results = self.parse_format(mf, prop_node)
-                            if format_results and len(format_results[0]) > 1:
-                                if '__type__' in value:
-                                    value['__type__'] += ' ' + format_results[0].pop('__type__')
-
-                                value.update(format_results[0])
-
-                        except:
-                            pass
-
-                    # Check if this property is a compound property
-                    if len(prop):
-                        try:
-                            prop_result = self._parse_node(prop_node, prop)
-                            if len(prop_result) > 1:
-                                if '__type__' in value:
-                                    value['__type__'] += ' ' + prop_result.pop('__type__')
-
-                                value.update(prop_result)
-                        except:
-                            pass
+    def _find_elemental(self, mfs, root=None):
+        """the elements for each feature of the elemental formats mfs, as (mf, feature name, elements)"""
+        root = root if root is not None else self.root
 
+        # where the elements for each (attribute, token) go, one list per feature
+        features = {}
+        found = []
+        for mf in mfs:
+            format = self.schema.get(mf)
+            for feature in format.properties:
+                nodes = []
+                features.setdefault((feature.attribute, feature.name), []).append(nodes)
+                found.append((mf, feature.name, nodes))
+
+        index = self._document_index(root, [attribute for attribute, token in features])
+        if index is not None:
+            node = root.getroot() if hasattr(root, 'getroot') else root
+            for (attribute, token), lists in features.items():
+                matches = index.find(node, attribute, token)
+                for nodes in lists:
+                    nodes.extend(matches)
+        else:
+            attributes = sorted(set(attribute for attribute, token in features))
+            for node in self.schema.find_elemental(root):
+                for attribute in attributes:
+                    value = node.get(attribute)
                     if not value:
-                        value['__type__'] = prop_type
-                        value['__srcline__'] = prop_node.sourceline
+                        continue
+                    for token in set(_split_tokens(value)):
+                        for nodes in features.get((attribute, token), ()):
+                            nodes.append(node)
+        return found
+
+    def parse_incremental(self, mf, previous=None, root=None):
+        """parse_format, reusing the results for roots unchanged since an earlier run
+
+        Each root of mf is fingerprinted by hashing its serialized
+        subtree, along with the schema version and the options which
+        change the results. Roots whose fingerprint is in previous aren't parsed
+        again: their earlier results (and any errors collected while
+        parsing them) are reused, with source lines adjusted for where
+        the root is now.
+
+        previous -- the fingerprints returned by an earlier call for the
+                    same format (entries from other schemas or options
+                    never match)
+        returns (results, fingerprints)
+
+        Each root has to be parsed in full for its results to be kept,
+        so with lazy=True the results are still plain dicts rather than
+        LazyResults.
+        """
+        format = self.schema.get(mf)
+        if format.type != 'compound':
+            return self.parse_format(mf, root), {}
+
+        root = root if root is not None else self.root
+        previous = previous or {}
+        fingerprints = {}
+        results = []
+        settings = ('%s\0%s\0strict=%s\0collect_errors=%s\0' % (format.tag, self.schema.version, bool(self.strict), bool(self.collect_errors))).encode('utf-8')
+        for node in self._find(root, 'class', format.tag, format.find_roots):
+            digest = hashlib.sha1(settings)
+            digest.update(lxml.etree.tostring(node, with_tail=False))
+            fingerprint = digest.hexdigest()
+
+            entry = fingerprints.get(fingerprint) or previous.get(fingerprint)
+            if entry is None:
+                errors = len(self.errors)
+                result = self._parse_node(node, format, False)
+                entry = (node.sourceline, copy.deepcopy(result), self.errors[errors:])
+            else:
+                sourceline, result, errors = entry
+                delta = node.sourceline - sourceline if sourceline is not None else 0
+                result = _shift_sourcelines(result, delta)
+                for err in errors:
+                    self.errors.append(ParseError(err.args[0], err.sourceline + delta if err.sourceline is not None else None))
+            fingerprints[fingerprint] = entry
+            results.append(result)
+
+        if self.records:
+            results = [self.schema.to_record(result, format) for result in results]
+        return results, fingerprints
+
+    def reset(self, tree):
+        """start on a new document, keeping the parser configuration"""
+        self.root = tree
+        self.errors = []
+        self.clear_cache()
 
-                        if prop_type == 'text':
-                            value = self._parse_value(prop_node)
+    def clear_cache(self):
+        """forget memoized results and the document index"""
+        self._results = {}
+        self._texts = {}
+        self.index = None
 
-                        elif prop_type in ('url', 'email'):
-                            value['text'] = self._parse_text(prop_node)
-                            if 'href' in prop_node.attrib:
-                                value['href'] = prop_node.attrib['href']
-                                for prefix in ('mailto', 'tel', 'fax', 'modem'):
-                                    if value['href'].lower().startswith(prefix + ':'):
-                                        value[prefix] = value['href'][len(prefix + ':'):]
-                                        break
+    def parse_formats(self, mfs, root=None):
+        """parse several formats, returning a dict of results keyed by format
 
-                        elif prop_type == 'image':
-                            if 'title' in prop_node.attrib:
-                                value['title'] = prop_node.attrib['title']
+        The document is indexed in a single walk and the roots of every
+        format are found from that index, rather than rescanning the
+        tree once per format.
+        """
+        root = root if root is not None else self.root
+        if self.index is None:
+            self._build_index(root)
+        elemental = [mf for mf in mfs if self.schema.get(mf).type == 'elemental']
+        results = self.parse_elemental(elemental, root) if elemental else {}
+        for mf in mfs:
+            if mf not in results:
+                results[mf] = self.parse_format(mf, root)
+        return results
 
-                            if 'alt' in prop_node.attrib:
-                                value['alt'] = prop_node.attrib['alt']
+    def parse_all(self, root=None):
+        """parse every format in the schema (see parse_formats)"""
+        return self.parse_formats([format.name for format in self.schema.formats], root)
+
+    def iterparse(self, source, mfs, html=True):
+        """parse formats from a file incrementally, yielding (format, result) pairs
+
+        The document is never held in memory as a whole: each outermost
+        root of any of the formats is parsed as soon as its end tag has
+        been read, and is then discarded along with everything read
+        before it. Roots nested inside it are reported at the same time:
+        the results for each outermost root are grouped by format, in the
+        order of mfs, and are in document order within each format. With
+        index=True, each outermost root is indexed on its own. Only
+        compound formats can be streamed. With lazy=True the results
+        are materialized (see LazyResult) before their elements are
+        discarded.
+
+        source -- a filename, url or file object
+        mfs    -- list of the microformats to extract
+        html   -- parse source as html (otherwise as xml)
+        """
+        formats = []
+        for mf in mfs:
+            format = self.schema.get(mf)
+            if format.type != 'compound':
+                raise Exception( "can't stream non-compound format '%s'" % (mf) )
+            formats.append((mf, format))
+        tags = frozenset(format.tag for mf, format in formats)
+
+        roots = []  # the roots we are currently inside, outermost first
+        for event, element in lxml.etree.iterparse(source, events=('start', 'end'), html=html):
+            if event == 'start':
+                value = element.get('class')
+                if value and not tags.isdisjoint(_split_tokens(value)):
+                    roots.append(element)
+                continue
 
-                            if 'src' in prop_node.attrib:
-                                value['src'] = prop_node.attrib['src']
+            if roots and roots[-1] is element:
+                roots.pop()
+                if not roots:
+                    if self.use_index:
+                        self._build_index(element)
+                    for mf, format in formats:
+                        for result in self.parse_format(mf, element):
+                            if isinstance(result, LazyResult):
+                                result = result.materialize()
+                            yield mf, result
+                    self.clear_cache()
+
+            # everything up to the end of this element has been dealt with
+            if not roots:
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+    def _instrument(self):
+        """replace this parser's methods with ones that record into self.stats"""
+        stats = self.stats
+        for event, name in (('find_roots', '_find'), ('find_props', '_find_props'),
+                            ('find_value_nodes', '_find_value_nodes'), ('parse_text', '_parse_text'),
+                            ('datetime', '_parse_datetime_value'), ('elemental', '_find_elemental')):
+            setattr(self, name, stats.timed(event, getattr(self, name)))
+
+        parse_node = self._parse_node
+        def _parse_node(node, format, store=True):
+            start = _timer()
+            try:
+                return parse_node(node, format, store)
+            finally:
+                elapsed = _timer() - start
+                stats.record('parse_node', elapsed)
+                stats.record('parse_node:' + format.tag, elapsed)
+        self._parse_node = _parse_node
+
+    def _error(self, err):
+        """report a parse error: raise it, or collect it and carry on"""
+        if self.stats is not None:
+            self.stats.record('error')
+        if self.collect_errors:
+            self.errors.append(err)
+        else:
+            raise err
+
+    def _document_index(self, node, attributes=('class',)):
+        """the index covering node and attributes, or None if xpath should be used instead"""
+        if self.index is None:
+            if not self.use_index:
+                return None
+            # (a parser made without a document indexes the first one it is given)
+            self._build_index(self.root if self.root is not None else node)
+        if hasattr(node, 'getroot'):
+            node = node.getroot()
+        if not self.index.covers(node) or not self.index.indexes(attributes):
+            return None
+        return self.index
+
+    def _build_index(self, root=None):
+        start = _timer()
+        self.index = DocumentIndex(root if root is not None else self.root, self.schema.attributes)
+        if self.stats is not None:
+            self.stats.record('index', _timer() - start)
+
+    def _find(self, node, attribute, token, xpath):
+        """elements under (or at) node whose attribute contains token"""
+        index = self._document_index(node, (attribute,))
+        if index is None:
+            return xpath(node)
+        if hasattr(node, 'getroot'):
+            node = node.getroot()
+        return index.find(node, attribute, token)
+
+    def _find_props(self, node, format, prop):
+        """nodes for prop belonging to node, excluding those of nested formats"""
+        index = self._document_index(node, (prop.attribute,))
+        if index is None:
+            return [prop_node for prop_node in prop.find(node) if format.find_parent(prop_node) == [node]]
+        return [prop_node for prop_node in index.find(node, prop.attribute, prop.name) if index.enclosing(prop_node, format.tag) is node]
+
+    def _parse_node(self, node, format, store=True):
+        """parse node as format, using (and if store, saving) the memoized result
+
+        The roots parse_format() finds are looked up but not stored:
+        storing costs a copy, which only pays off for nested formats,
+        as they are the ones reached again from elsewhere.
+        """
+        if not self.memoize:
+            return self._parse_node_uncached(node, format)
+
+        # results are handed out as copies, as callers are free to modify them
+        key = (node, format)
+        if key in self._results:
+            return self._copy_result(self._results[key])
+        result = self._parse_node_uncached(node, format)
+        if store:
+            self._results[key] = self._copy_result(result)
+        return result
 
-                        elif prop_type == 'object':
-                            value['text'] = self._parse_text(prop_node)
-                            if 'data' in prop_node.attrib:
-                                value['data'] = prop_node.attrib['data']
+    def _parse_node_uncached(self, node, format):
+        if self.compiled:
+            return format.extractor(self, node)
 
-                        elif prop_type == 'date':
-                            value['text'] = self._parse_text(prop_node)
-                            # TODO: do we need a date-specific parsing fn which barfs if a time is included?
-                            value['date'] = self._parse_datetime_value(prop_node)
+        result = {'__type__': format.tag}
+        for prop in format.properties:
+            value = self._parse_property(node, format, prop)
+            if value is not _missing:
+                result[prop.name] = value
 
-                        elif prop_type == 'datetime':
-                            value['text'] = self._parse_text(prop_node)
-                            value['datetime'] = self._parse_datetime_value(prop_node)
+        return result
 
-                        else:
-                            # Try to parse this property as a sub-format
-                            results = self.parse_format(prop_type, prop_node)
-                            if results and len(results[0]) > 1:
-                                value = results[0]
-                            else:
-                                raise Exception("Could not parse expected format: '%s'" % (prop_type,))
-
-                # TODO: revamp exception handling - BenC
-                # this isn't the place to catch/collect the errors. they should
-                # be caught further down, where the code is better able to
-                # continue parsing.
-                except Exception, e:
-                    if self.strict:
-                        err = ParseError("Error parsing value for property '%s': %s" % (prop_name, e), sourceline=prop_node.sourceline)
-                        if self.collect_errors:
-                            self.errors.append(err)
-                            continue    # go on to next property
-                        else:
-                            raise err
-                    else:
+    def _parse_property(self, node, format, prop):
+        """ parse a single property of the format rooted at node (_missing if absent) """
+        prop_name = prop.name
+        prop_type = prop.type
+        prop_many = prop.many
+
+        # Select all properties, but exclude nested properties
+        prop_nodes = self._find_props(node, format, prop)
+
+        # missing something required?
+        if self.strict and not prop_nodes and prop.mandatory:
+            err = ParseError("missing mandatory %s property: %s" % (format.tag, prop_name), node.sourceline)
+            self._error(err)
+            return _missing
+
+        if prop_many == 'many':
+            values = []
+        elif prop_many == 'manyasone':
+            values = []
+
+        # for each node matching the property we're looking for...
+        for prop_node in prop_nodes:
+            try:
+                # Check if this prop_node is one or more of the possible "could be" formats
+                value = {}
+                for mf in prop.couldbe:
+                    if self.stats is not None:
+                        self.stats.record('couldbe')
+                    try:
+                        format_results = self._parse_format(prop.subformats.get(mf, mf), prop_node)
+                        if format_results and len(format_results[0]) > 1:
+                            if '__type__' in value:
+                                value['__type__'] += ' ' + format_results[0].pop('__type__')
+
+                            value.update(format_results[0])
+
+                    except:
+                        if self.stats is not None:
+                            self.stats.record('couldbe_failed')
+
+                # Check if this property is a compound property
+                if prop.format is not None:
+                    try:
+                        prop_result = self._parse_node(prop_node, prop.format)
+                        if len(prop_result) > 1:
+                            if '__type__' in value:
+                                value['__type__'] += ' ' + prop_result.pop('__type__')
+
+                            value.update(prop_result)
+                    except:
+                        if self.stats is not None:
+                            self.stats.record('compound_failed')
+
+                if not value:
+                    value['__type__'] = prop_type
+                    value['__srcline__'] = prop_node.sourceline
+
+                    if prop_type == 'text':
                         value = self._parse_value(prop_node)
 
-                # Convert the value to a string (if it isn't one already)
-                if isinstance(value, basestring):
-                    value_text = value
-                elif 'text' in value:
-                    value_text = value['text']
-                else:
-                    value_text = ""
+                    elif prop_type in ('url', 'email'):
+                        value['text'] = self._parse_text(prop_node)
+                        if 'href' in prop_node.attrib:
+                            value['href'] = prop_node.attrib['href']
+                            for prefix in ('mailto', 'tel', 'fax', 'modem'):
+                                if value['href'].lower().startswith(prefix + ':'):
+                                    value[prefix] = value['href'][len(prefix + ':'):]
+                                    break
 
-                if self.strict and prop_values and value_text.lower() not in prop_values:
-                    err = ParseError("Invalid value for property '%s': %s" % (prop_name, value))
-                    if self.collect_errors:
-                        self.errors.append(err)
-                        continue    # go on to next property
-                    else:
-                        raise err
+                    elif prop_type == 'image':
+                        if 'title' in prop_node.attrib:
+                            value['title'] = prop_node.attrib['title']
+
+                        if 'alt' in prop_node.attrib:
+                            value['alt'] = prop_node.attrib['alt']
+
+                        if 'src' in prop_node.attrib:
+                            value['src'] = prop_node.attrib['src']
 
-                if prop_many == 'many':
-                    values.append(value)
+                    elif prop_type == 'object':
+                        value['text'] = self._parse_text(prop_node)
+                        if 'data' in prop_node.attrib:
+                            value['data'] = prop_node.attrib['data']
 
-                elif prop_many == 'manyasone':
-                    if value_text:
-                        if values and prop_separator:
-                            values += prop_separator
+                    elif prop_type == 'date':
+                        value['text'] = self._parse_text(prop_node)
+                        # TODO: do we need a date-specific parsing fn which barfs if a time is included?
+                        value['date'] = self._parse_datetime_value(prop_node)
 
-                        values += value_text
+                    elif prop_type == 'datetime':
+                        value['text'] = self._parse_text(prop_node)
+                        value['datetime'] = self._parse_datetime_value(prop_node)
 
+                    else:
+                        # Try to parse this property as a sub-format
+                        results = self._parse_format(prop.subformats.get(prop_type, prop_type), prop_node)
+                        if results and len(results[0]) > 1:
+                            value = results[0]
+                        else:
+                            raise Exception("Could not parse expected format: '%s'" % (prop_type,))
+
+            # TODO: revamp exception handling - BenC
+            # this isn't the place to catch/collect the errors. they should
+            # be caught further down, where the code is better able to
+            # continue parsing.
+            except Exception as e:
+                if self.strict:
+                    err = ParseError("Error parsing value for property '%s': %s" % (prop_name, e), sourceline=prop_node.sourceline)
+                    self._error(err)
+                    continue    # go on to next property
                 else:
-                    result[prop_name] = value
-                    break
+                    if self.stats is not None:
+                        self.stats.record('fallback')
+                    value = self._parse_value(prop_node)
+
+            # Convert the value to a string (if it isn't one already)
+            if isinstance(value, basestring):
+                value_text = value
+            elif 'text' in value:
+                value_text = value['text']
+            else:
+                value_text = ""
 
-            if prop_many and values:
-                result[prop_name] = values
+            if self.strict and prop.values and value_text.lower() not in prop.values:
+                err = ParseError("Invalid value for property '%s': %s" % (prop_name, value), sourceline=prop_node.sourceline)
+                self._error(err)
+                continue    # go on to next property
 
-        return result
+            if prop_many == 'many':
+                values.append(value)
+
+            elif prop_many == 'manyasone':
+                if value_text:
+                    values.append(value_text)
+
+            else:
+                return value
+
+        if prop_many == 'manyasone' and values:
+            return prop.separator.join(values)
+        if prop_many and values:
+            return values
+
+        return _missing
 
 
 
@@ -258,42 +1558,33 @@ class Parser(object):
         for n in value_nodes:
             txt = self._get_value_frag(n).strip()
 
-            # try bare timezone
-            obj = self._eval_as_tzinfo(txt)
-            if obj is not None:
+            kind, obj = _eval_datetime_fragment(txt)
+            if kind == 'tzinfo':
                 if tzinfo_part is None:
                     tzinfo_part = obj
                 else:
                     pass # should warn about multiple times in strict mode?
                 continue
 
-            # try time (+optional timezone)
-            obj = self._eval_as_time(txt)
-            if obj is not None:
+            if kind == 'time':
                 if time_part is None:
                     time_part = obj
                 else:
                     pass # should warn about multiple times in strict mode?
                 continue
 
-            # try bare date
-            obj = self._eval_as_date(txt)
-            if obj is not None:
+            if kind == 'date':
                 if date_part is None:
                     date_part = obj
                 else:
                     pass # should warn about multiple times in strict mode?
                 continue
 
-
             # if we get this far we've not been able use fragment as part of
             # a datetime...
             if self.strict:
                 err = ParseError("Bad datetime value '%s'" % (txt), sourceline=n.sourceline)
-                if self.collect_errors:
-                   self.errors.append(err)
-                else:
-                   raise err
+                self._error(err)
 
         # now assemble the fragments we've accumulated
         if time_part is None:
@@ -310,18 +1601,15 @@ class Parser(object):
     def _get_value_frag(self, n):
         """ get a value fragment from a single element """
 
-        if n.tag =='abbr' or ('value-title' in n.attrib['class']):
+        if n.tag =='abbr' or ('value-title' in n.get('class', '')):
             # value is in title attr.
             if 'title' in n.attrib:
                 return n.attrib['title']
             else:
                 if self.strict:
                     err = ParseError("missing required 'title' attr on '%s' value element" % (n.tag), sourceline=n.sourceline)
-                    if self.collect_errors:
-                        self.errors.append(err)
-                        return ''   # just to allow parsing to continue
-                    else:
-                       raise err
+                    self._error(err)
+                    return ''   # just to allow parsing to continue
                 else:
                     return ''
 
@@ -331,11 +1619,8 @@ class Parser(object):
             else:
                 if self.strict:
                     err = ParseError("missing required 'alt' attr on '%s' value element" % (n.tag), sourceline=n.sourceline)
-                    if self.collect_errors:
-                        self.errors.append(err)
-                        return ''   # just to allow parsing to continue
-                    else:
-                       raise err
+                    self._error(err)
+                    return ''   # just to allow parsing to continue
                 else:
                     return ''
 
@@ -345,120 +1630,190 @@ class Parser(object):
 
 
     def _parse_text(self, node):
-        text_expr = 'normalize-space(string(.))'
-        return node.xpath(text_expr)
+        """the text content of node, whitespace normalised (as normalize-space())"""
+        text = self._texts.get(node)
+        if text is None:
+            text = self._texts[node] = _whitespace.sub(' ', ''.join(node.itertext())).strip(' ')
+        return text
 
 
     def _eval_as_tzinfo(self, txt):
         """try and parse a timezone, as per value-class-pattern rules"""
-
-        tzpat = r'^(?P<tzname>(?:(?P<tzsign>[-+])(?:(?P<tzhour>\d{1,2})[:]?(?P<tzmin>\d\d)))|(?P<tzzulu>Z))$'
-
-        m = re.compile(tzpat,re.IGNORECASE).match(txt)
-        if m:
-            return self._compose_tzinfo( m.groupdict() )
-        # TODO: special case for timezones "-XX" "+XX"
-        return None
-
-
+        return _eval_as_tzinfo(txt)
 
     def _eval_as_time(self, txt):
-        """try and parse a time, as per value-class-pattern rules""" 
-
-        timepat = r'(?P<hour>\d{1,2})[:](?P<min>\d\d)(?:[:](?P<sec>\d\d))?'
-        ampmpat = r'(?:(?P<am>am|a[.]m[.])|(?P<pm>pm|p[.]m[.]))'
-        tzpat = r'(?P<tzname>(?:(?P<tzsign>[-+])(?:(?P<tzhour>\d{1,2})[:]?(?P<tzmin>\d\d)))|(?P<tzzulu>Z))'
-
-        # looking for time or time+timezone
-        m = re.compile("^"+timepat+ampmpat+"?"+tzpat+"?$",re.IGNORECASE).match(txt)
-        if m:
-            return self._compose_time(m.groupdict())
-
-        # special case for HHam and HHpm
-        m = re.compile(r'^(?P<hour>\d{1,2})'+ampmpat+r'?$',re.IGNORECASE).match(txt)
-        if m:
-            return self._compose_time(m.groupdict())
-        return None
-
-
+        """try and parse a time, as per value-class-pattern rules"""
+        return _eval_as_time(txt)
 
     def _eval_as_date(self, txt):
-        """try and parse a date, as per value-class-pattern rules""" 
-        datepat = r'^(?P<year>\d\d\d\d)-(?P<month>\d\d)-(?P<day>\d\d)$' # YYYY-MM-DD
-        m = re.compile( datepat, re.IGNORECASE ).match(txt)
-        if m:
-            return self._compose_date(m.groupdict())
-
-        orddatepat = r'^(?P<year>\d\d\d\d)-(?P<ordinalday>\d\d\d)$' # YYYY-DDD   -Ordinal date
-        m = re.compile( orddatepat, re.IGNORECASE ).match(txt)
-        if m:
-            return self._compose_date(m.groupdict())
-
-        return None
-
-
-    def _eval_as_datetime(self,txt):
-        parts = txt.split('T')
-        if len(parts) != 2:
-            return None
-        date = self._eval_as_date(parts[0])
-        time = self._eval_as_time(parts[1])
-        if date is None or time is None:
-            return None
-        return datetime.datetime.combine( date, time )
-
-
-    def _compose_tzinfo(self, g):
-        """build a tzinfo from extracted parts"""
-        if g.get('tzname') is None:
-            return None
-
-        if g['tzzulu'] is not None:
-            tzinfo = isodate.tzinfo.Utc()
-        else:
-            tzsign = ((g['tzsign'] == '-') and -1) or 1
-            tzhour = int(g['tzhour'])
-            tzmin = 0
-            if g['tzmin']:
-                tzmin = int(g['tzmin'])
-            tzinfo = isodate.tzinfo.FixedOffset(tzsign*tzhour, tzsign*tzmin, g['tzname'])
-        return tzinfo
-
-
-
-    def _compose_time(self,g):
-        """build a time object from extracted parts"""
-        # get time
-        hour = int(g['hour'])
-
-        min=0
-        if g.get('min') is not None:
-            min = int(g['min'])
-
-        sec=0
-        if g.get('sec') is not None:
-            sec = int( g['sec'] )
-
-        if g['am'] is not None:
-            if hour==12:
-                hour = 0
-        elif g['pm'] is not None:
-            if hour < 12:
-                hour += 12
-        if hour==24:
-            hour = 0
-
-        # get timezone, if any
-        tzinfo = self._compose_tzinfo(g)
-
-        return datetime.time(hour, min, sec, 0, tzinfo )
-
-    def _compose_date(self,g):
-        """build a date object from extracted parts"""
-        if 'month' in g:
-            return datetime.date(int(g['year']), int(g['month']), int(g['day']))
-        else:
-            # ordinal date YYYY-DDD
-            return datetime.date(int(g['year']),1,1 ) + datetime.timedelta(days=int(g['ordinalday'])-1)
-
+        """try and parse a date, as per value-class-pattern rules"""
+        return _eval_as_date(txt)
+
+    def _eval_as_datetime(self, txt):
+        return _eval_as_datetime(txt)
+
+
+
+class Validator(Parser):
+    """checks the formats in a document, without extracting them
+
+    validate() reports the errors Parser(tree, strict=True,
+    collect_errors=True) would collect: missing mandatory properties,
+    values not in a property's allowed set, value elements without their
+    title or alt, and dates which can't be parsed. Each is reported once,
+    where a strict Parser reports it again each time it comes across a
+    nested format. Property values are only worked out as far as these
+    checks need, so a format's "result" just records which of its
+    properties were found.
+    """
+
+    # results are thrown away, so nested ones needn't be copied
+    _copy_result = staticmethod(dict)
+
+    def __init__(self, tree, formats=None, **options):
+        options.update(strict=True, collect_errors=True, records=False, lazy=False, compiled=False)
+        Parser.__init__(self, tree, formats, **options)
+
+    def validate(self, mfs, root=None):
+        """check the given formats, returning the errors found (ordered by line)"""
+        self.parse_formats(mfs, root)
+        seen = set()
+        errors = []
+        for err in self.errors:
+            key = (err.sourceline, err.args[0])
+            if key not in seen:
+                seen.add(key)
+                errors.append(err)
+        errors.sort(key=lambda err: err.sourceline or 0)
+        self.errors = errors
+        return errors
+
+    def _parse_property(self, node, format, prop):
+        """ check a single property of the format rooted at node (True if found, else _missing) """
+        manyasone = prop.many == 'manyasone'
+        if prop.values or (manyasone and (prop.couldbe or prop.format is not None or
+                                          prop.type not in ('text', 'url', 'email', 'object', 'image', 'date', 'datetime'))):
+            # the checks need the value itself
+            return Parser._parse_property(self, node, format, prop)
+
+        prop_nodes = self._find_props(node, format, prop)
+        if not prop_nodes and prop.mandatory:
+            err = ParseError("missing mandatory %s property: %s" % (format.tag, prop.name), node.sourceline)
+            self._error(err)
+            return _missing
+
+        found = False
+        for prop_node in prop_nodes:
+            try:
+                has_value = self._check_value(prop_node, prop, manyasone)
+            except Exception as e:
+                err = ParseError("Error parsing value for property '%s': %s" % (prop.name, e), sourceline=prop_node.sourceline)
+                self._error(err)
+                continue
+            if prop.many not in ('many', 'manyasone'):
+                # only the first value of a single property is looked at
+                return True
+            found = found or has_value
+        return True if found else _missing
+
+    def _check_value(self, prop_node, prop, manyasone):
+        """ check the value of prop at prop_node, returning whether it has one
+
+        For manyasone properties a value only counts if it has some text.
+        Raises an exception where Parser._parse_property would fail to
+        parse the value.
+        """
+        found = False
+        for mf in prop.couldbe:
+            try:
+                results = self._parse_format(prop.subformats.get(mf, mf), prop_node)
+                found = found or bool(results and len(results[0]) > 1)
+            except Exception:
+                pass
+        if prop.format is not None:
+            try:
+                found = len(self._parse_node(prop_node, prop.format)) > 1 or found
+            except Exception:
+                pass
+        if found:
+            return True
+
+        prop_type = prop.type
+        if prop_type == 'text':
+            return self._check_value_text(prop_node, manyasone)
+        if prop_type in ('url', 'email', 'object'):
+            return not manyasone or self._has_text(prop_node)
+        if prop_type == 'image':
+            # image values have no text
+            return not manyasone
+        if prop_type in ('date', 'datetime'):
+            self._parse_datetime_value(prop_node)
+            return not manyasone or self._has_text(prop_node)
+
+        results = self._parse_format(prop.subformats.get(prop_type, prop_type), prop_node)
+        if results and len(results[0]) > 1:
+            return True
+        raise Exception("Could not parse expected format: '%s'" % (prop_type,))
+
+    def _check_value_text(self, node, need_text):
+        """ check the value fragments of node (as _parse_value), returning whether they have any text """
+        has_text = False
+        for n in self._find_value_nodes(node) or [node]:
+            if n.tag == 'abbr' or ('value-title' in n.get('class', '')):
+                attr = 'title'
+            elif n.tag in ('img', 'area'):
+                attr = 'alt'
+            else:
+                has_text = has_text or (need_text and self._has_text(n))
+                continue
+            if attr in n.attrib:
+                has_text = has_text or bool(n.attrib[attr])
+            else:
+                err = ParseError("missing required '%s' attr on '%s' value element" % (attr, n.tag), sourceline=n.sourceline)
+                self._error(err)
+        return has_text if need_text else True
 
+    def _find_value_nodes(self, node):
+        index = self._document_index(node)
+        if index is None:
+            return Parser._find_value_nodes(self, node)
+        # (as the xpath, these are descendants only)
+        return [n for n in index.find_any(node, 'class', ('value', 'value-title')) if n is not node]
+
+    def _has_text(self, node):
+        """ whether _parse_text(node) would be non-empty """
+        for text in node.itertext():
+            if text.strip(' \t\r\n'):
+                return True
+        return False
+
+
+class Extractor(object):
+    """parser configuration, which can be shared between documents and threads
+
+    An Extractor holds the compiled schema and the options for Parser.
+    The state of parsing a particular document (its errors, memoized
+    results and index) lives in the Parser that parser() makes for it,
+    which is cheap as nothing is compiled or loaded again. Extractors
+    aren't changed after they are made, so one can serve any number of
+    threads at once.
+
+    formats -- the microformat definitions, as for Parser
+    options -- passed on to each Parser (strict, collect_errors, index, ...)
+    """
+
+    def __init__(self, formats=None, **options):
+        self.schema = get_schema(formats)
+        self.options = options
+
+    def parser(self, tree):
+        """a Parser for the document tree, with this configuration"""
+        return Parser(tree, self.schema, **self.options)
+
+    def parse_format(self, tree, mf, root=None, fields=None):
+        """parse mf from tree (use parser() to get at the errors collected)"""
+        return self.parser(tree).parse_format(mf, root, fields)
+
+    def parse_formats(self, tree, mfs, root=None):
+        """parse several formats from tree (see Parser.parse_formats)"""
+        return self.parser(tree).parse_formats(mfs, root)
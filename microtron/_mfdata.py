@@ -0,0 +1,222 @@
+# generated from mf.xml by microtron.schemagen - do not edit
+
+# sha1 of the mf.xml this was generated from
+source = 'f629e1872600e2bc30bc1bec78ce2bf142334668'
+
+# Schema.version for these definitions
+version = '4e952b50733c381df0d855de705549f1d76245e6'
+
+formats = (
+    ('vcard', {'name': 'hcard', 'type': 'compound'}, (
+        ('adr', {'many': 'many', 'type': 'adr'}, ()),
+        ('agent', {'couldbe': 'vcard', 'many': 'many'}, ()),
+        ('bday', {'type': 'date'}, ()),
+        ('class', {'type': 'text'}, ()),
+        ('category', {'many': 'many', 'rel': 'tag'}, ()),
+        ('email', {'many': 'many', 'type': 'email'}, (
+            ('type', {'many': 'many', 'values': 'internet,x400,pref'}, ()),
+            ('value', {'many': 'manyasone', 'type': 'text'}, ()),
+        )),
+        ('fn', {'mandatory': 'yes', 'type': 'text'}, ()),
+        ('geo', {'type': 'geo'}, ()),
+        ('key', {'many': 'many'}, ()),
+        ('label', {'many': 'many'}, ()),
+        ('logo', {'many': 'many', 'type': 'image'}, ()),
+        ('mailer', {'many': 'many'}, ()),
+        ('n', {}, (
+            ('additional-name', {'many': 'many', 'type': 'text'}, ()),
+            ('family-name', {'many': 'many', 'type': 'text'}, ()),
+            ('given-name', {'many': 'many', 'type': 'text'}, ()),
+            ('honorific-prefix', {'many': 'many', 'type': 'text'}, ()),
+            ('honorific-suffix', {'many': 'many', 'type': 'text'}, ()),
+        )),
+        ('nickname', {'many': 'many', 'type': 'text'}, ()),
+        ('note', {'many': 'manyasone', 'separator': ' ', 'type': 'text'}, ()),
+        ('org', {'many': 'many'}, (
+            ('organization-name', {'type': 'text'}, ()),
+            ('organization-unit', {'many': 'many', 'type': 'text'}, ()),
+        )),
+        ('photo', {'many': 'many', 'type': 'image'}, ()),
+        ('rev', {'type': 'text'}, ()),
+        ('role', {'type': 'text'}, ()),
+        ('sort-string', {'type': 'text'}, ()),
+        ('sound', {'many': 'many'}, ()),
+        ('title', {'many': 'many', 'type': 'text'}, ()),
+        ('tel', {'many': 'many', 'type': 'text'}, (
+            ('type', {'many': 'many', 'values': 'home,msg,work,pref,voice,fax,cell,video,bbs,modem,car,isdn,pcs'}, ()),
+            ('value', {'many': 'manyasone', 'separator': '', 'type': 'text'}, ()),
+        )),
+        ('tz', {'type': 'text'}, ()),
+        ('uid', {'type': 'text'}, ()),
+        ('url', {'many': 'many', 'type': 'url'}, ()),
+    )),
+    ('vcalendar', {'many': 'many', 'type': 'compound'}, (
+        ('vevent', {'many': 'many', 'type': 'vevent'}, ()),
+    )),
+    ('vevent', {'name': 'hcalendar', 'type': 'compound'}, (
+        ('category', {'many': 'many', 'rel': 'tag'}, ()),
+        ('class', {'type': 'text'}, ()),
+        ('description', {'type': 'text'}, ()),
+        ('dtend', {'type': 'date'}, ()),
+        ('dtstamp', {'type': 'date'}, ()),
+        ('dtstart', {'mandatory': 'yes', 'type': 'date'}, ()),
+        ('duration', {'type': 'date'}, ()),
+        ('geo', {'type': 'geo'}, ()),
+        ('last-modified', {'type': 'date'}, ()),
+        ('location', {'couldbe': 'vcard|adr|geo'}, ()),
+        ('status', {'type': 'text'}, ()),
+        ('summary', {'mandatory': 'yes', 'many': 'manyasone', 'separator': ' ', 'type': 'text'}, ()),
+        ('uid', {'type': 'text'}, ()),
+        ('url', {'type': 'url'}, ()),
+    )),
+    ('hfeed', {'name': 'hatom', 'type': 'compound'}, (
+        ('tag', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('hentry', {'many': 'many', 'type': 'hentry'}, ()),
+    )),
+    ('hentry', {'type': 'compound'}, (
+        ('author', {'mandatory': 'yes', 'many': 'many', 'type': 'vcard'}, ()),
+        ('bookmark', {'attribute': 'rel', 'type': 'url'}, ()),
+        ('tag', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('entry-title', {'mandatory': 'yes', 'type': 'text'}, ()),
+        ('entry-content', {'many': 'manyasone', 'separator': ' ', 'type': 'text'}, ()),
+        ('entry-summary', {'many': 'manyasone', 'separator': ' ', 'type': 'text'}, ()),
+        ('published', {'type': 'datetime'}, ()),
+        ('updated', {'mandatory': 'yes', 'type': 'datetime'}, ()),
+    )),
+    ('hnews', {'type': 'compound'}, (
+        ('author', {'mandatory': 'yes', 'many': 'many', 'type': 'vcard'}, ()),
+        ('bookmark', {'attribute': 'rel', 'type': 'url'}, ()),
+        ('tag', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('entry-title', {'mandatory': 'yes', 'type': 'text'}, ()),
+        ('entry-content', {'many': 'manyasone', 'separator': ' ', 'type': 'text'}, ()),
+        ('entry-summary', {'many': 'manyasone', 'separator': ' ', 'type': 'text'}, ()),
+        ('published', {'type': 'datetime'}, ()),
+        ('updated', {'mandatory': 'yes', 'type': 'datetime'}, ()),
+        ('principles', {'attribute': 'rel', 'type': 'url'}, ()),
+        ('item-license', {'attribute': 'rel', 'type': 'url'}, ()),
+        ('license', {'attribute': 'rel', 'type': 'url'}, ()),
+        ('dateline', {'couldbe': 'vcard|text'}, ()),
+        ('source-org', {'mandatory': 'yes', 'type': 'vcard'}, ()),
+        ('geo', {'type': 'geo'}, ()),
+    )),
+    ('hreview', {'type': 'compound'}, (
+        ('best', {}, ()),
+        ('description', {'type': 'text'}, ()),
+        ('dtreviewed', {'type': 'date'}, ()),
+        ('item', {'couldbe': 'vcard|vevent', 'mandatory': 'yes'}, (
+            ('fn', {'mandatory': 'yes'}, ()),
+            ('photo', {'type': 'image'}, ()),
+            ('url', {'type': 'url'}, ()),
+        )),
+        ('license', {'attribute': 'rel'}, ()),
+        ('permalink', {}, ()),
+        ('rating', {}, ()),
+        ('reviewer', {'type': 'vcard'}, ()),
+        ('summary', {'type': 'text'}, ()),
+        ('tag', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('type', {}, ()),
+        ('version', {}, ()),
+        ('worst', {}, ()),
+    )),
+    ('hlisting', {'type': 'compound'}, (
+        ('description', {'mandatory': 'yes', 'type': 'text'}, ()),
+        ('dtexpired', {'type': 'date'}, ()),
+        ('dtlisted', {'type': 'date'}, ()),
+        ('item', {'couldbe': 'vcard|vevent'}, (
+            ('adr', {'type': 'adr'}, ()),
+            ('fn', {'mandatory': 'yes'}, ()),
+            ('geo', {'type': 'geo'}, ()),
+            ('photo', {'type': 'image'}, ()),
+            ('url', {'type': 'url'}, ()),
+        )),
+        ('lister', {'mandatory': 'yes', 'type': 'vcard'}, ()),
+        ('permalink', {'type': 'url'}, ()),
+        ('price', {'type': 'text'}, ()),
+        ('summary', {'type': 'text'}, ()),
+        ('tag', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('version', {}, ()),
+    )),
+    ('haudio', {'type': 'compound'}, (
+        ('album', {'mandatory': 'yes', 'type': 'text'}, ()),
+        ('category', {'couldbe': 'tag', 'many': 'many'}, ()),
+        ('contributor', {'many': 'many', 'type': 'vcard'}, ()),
+        ('description', {'many': 'manyasone', 'type': 'text'}, ()),
+        ('duration', {'type': 'date'}, ()),
+        ('enclosure', {'attribute': 'rel', 'many': 'many', 'type': 'url'}, ()),
+        ('item', {'many': 'many', 'type': 'haudio'}, ()),
+        ('payment', {'attribute': 'rel', 'many': 'many', 'type': 'url'}, ()),
+        ('photo', {'many': 'many', 'type': 'image'}, ()),
+        ('position', {'type': 'number'}, ()),
+        ('price', {'type': 'text'}, ()),
+        ('published', {'many': 'many', 'type': 'date'}, ()),
+        ('sample', {'attribute': 'rel', 'many': 'many', 'type': 'url'}, ()),
+        ('title', {'mandatory': 'yes', 'type': 'text'}, ()),
+    )),
+    ('xfolkentry', {'type': 'compound'}, (
+        ('taggedlink', {'mandatory': 'yes'}, ()),
+        ('description', {'many': 'many', 'type': 'text'}, ()),
+        ('tag', {'attribute': 'rel', 'many': 'many'}, ()),
+    )),
+    ('hresume', {'type': 'compound'}, (
+        ('affiliation', {'many': 'many', 'type': 'vcard'}, ()),
+        ('contact', {'mandatory': 'yes', 'type': 'vcard'}, ()),
+        ('education', {'couldbe': 'vevent', 'many': 'many'}, (
+            ('degree', {'type': 'text'}, ()),
+            ('major', {'type': 'text'}, ()),
+        )),
+        ('experience', {'many': 'many', 'type': 'vevent'}, ()),
+        ('publication', {'many': 'many', 'type': 'citation'}, ()),
+        ('skill', {'many': 'many'}, ()),
+        ('summary', {}, ()),
+    )),
+    ('adr', {'type': 'compound'}, (
+        ('country-name', {'type': 'text'}, ()),
+        ('extended-address', {'many': 'many', 'type': 'text'}, ()),
+        ('locality', {'type': 'text'}, ()),
+        ('post-office-box', {'type': 'text'}, ()),
+        ('postal-code', {'type': 'text'}, ()),
+        ('region', {'type': 'text'}, ()),
+        ('street-address', {'many': 'many', 'type': 'text'}, ()),
+        ('type', {'many': 'many', 'values': 'dom,intl,postal,parcel,home,work,pref'}, ()),
+    )),
+    ('geo', {'type': 'compound'}, (
+        ('latitude', {}, ()),
+        ('longitude', {}, ()),
+    )),
+    ('xfn', {'type': 'elemental'}, (
+        ('acquaintance', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('child', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('co-resident', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('co-worker', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('colleague', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('contact', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('crush', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('date', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('friend', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('kin', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('me', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('met', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('muse', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('neighbor', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('parent', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('spouse', {'attribute': 'rel', 'many': 'many'}, ()),
+        ('sweetheart', {'attribute': 'rel', 'many': 'many'}, ()),
+    )),
+    ('votelinks', {'type': 'elemental'}, (
+        ('vote-abstain', {'attribute': 'rev', 'many': 'many'}, ()),
+        ('vote-against', {'attribute': 'rev', 'many': 'many'}, ()),
+        ('vote-for', {'attribute': 'rev', 'many': 'many'}, ()),
+    )),
+    ('rel-tag', {'type': 'elemental'}, (
+        ('tag', {'attribute': 'rel', 'many': 'many'}, ()),
+    )),
+    ('rel-nofollow', {'type': 'elemental'}, (
+        ('nofollow', {'attribute': 'rel', 'many': 'many'}, ()),
+    )),
+    ('rel-license', {'type': 'elemental'}, (
+        ('license', {'attribute': 'rel', 'many': 'many'}, ()),
+    )),
+    ('rel-principles', {'type': 'elemental'}, (
+        ('principles', {'attribute': 'rel', 'many': 'many'}, ()),
+    )),
+)
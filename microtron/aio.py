@@ -0,0 +1,148 @@
+"""extract microformats from asyncio code, without blocking the event loop
+
+Loading and parsing a document is done in a pool of threads (or
+processes), so a crawler can hand pages over as it fetches them. Needs
+python 3.7 or later.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import os
+
+import lxml.etree
+
+from microtron import Schema, default_schema
+from microtron import batch
+
+
+class AsyncExtractor(object):
+    """extracts microformats from documents in a bounded pool
+
+    formats   -- list of the microformats to extract
+    workers   -- number of threads (or processes) parsing documents
+                 (default: one per cpu)
+    limit     -- the most documents being extracted at once; further
+                 calls to extract() wait for a slot, and extract_stream()
+                 stops reading its sources until one is free
+                 (default: twice the number of workers)
+    processes -- parse in a pool of processes rather than threads. lxml
+                 only releases the GIL for parts of the work, so this
+                 scales better for cpu bound loads, at the cost of
+                 pickling the results back.
+    formats_file, backend, validate, options -- as for batch.extract_many()
+
+    Use it as an async context manager, or call close() when done.
+    """
+
+    def __init__(self, formats, workers=None, limit=None, processes=False, formats_file=None, backend='html', validate=False, **options):
+        self.formats = list(formats)
+        self.backend = backend
+        self.validate = validate
+        self.options = options
+        self.processes = processes
+        workers = workers or os.cpu_count() or 1
+        if processes:
+            self._executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=batch._init_worker, initargs=(formats_file,))
+            self._schema = None
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+            self._schema = default_schema() if formats_file is None else Schema(lxml.etree.parse(formats_file))
+        self.limit = limit or 2 * workers
+        self._slots = None
+
+    def _job(self, source):
+        if self.processes:
+            return functools.partial(batch._extract, (source, self.formats, self.backend, self.validate, self.options))
+        return functools.partial(batch.extract, source, self.formats, self._schema, self.backend, self.validate, **self.options)
+
+    async def extract(self, source):
+        """extract the formats from source, returning a batch.DocumentResult
+
+        Cancelling the call drops the document if it hasn't been started
+        on yet; one already being parsed is finished and thrown away.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._job(source))
+
+    async def extract_stream(self, sources, ordered=False):
+        """extract the formats from each of sources as they arrive
+
+        sources -- an async iterable (or plain iterable) of documents,
+                   as accepted by microtron.load()
+        ordered -- if True, results come back in the same order as
+                   sources, otherwise as soon as they are finished
+
+        An async generator of batch.DocumentResults. No more than limit
+        sources are read ahead of the results being consumed. Closing the
+        generator (or cancelling the task iterating over it) cancels the
+        documents still waiting, and closes sources if it is an async
+        generator.
+        """
+        sources = _aiter(sources)
+        running = []
+        fetch = None
+        exhausted = False
+        try:
+            while True:
+                if fetch is None and not exhausted and len(running) < self.limit:
+                    fetch = asyncio.ensure_future(_anext(sources))
+                if fetch is None and not running:
+                    return
+
+                waiting = set(running)
+                if fetch is not None:
+                    waiting.add(fetch)
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                if fetch in done:
+                    try:
+                        running.append(asyncio.ensure_future(self.extract(fetch.result())))
+                    except StopAsyncIteration:
+                        exhausted = True
+                    fetch = None
+
+                if ordered:
+                    while running and running[0].done():
+                        yield running.pop(0).result()
+                else:
+                    for task in [task for task in running if task.done()]:
+                        running.remove(task)
+                        yield task.result()
+        finally:
+            pending = running + ([fetch] if fetch is not None else [])
+            for task in pending:
+                task.cancel()
+            # wait for them to finish cancelling, then close the sources,
+            # so nothing is left pending when the stream is abandoned
+            await asyncio.gather(*pending, return_exceptions=True)
+            await sources.aclose()
+
+    def close(self, wait=True):
+        """shut the pool down"""
+        self._executor.shutdown(wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close(wait=False)
+
+
+async def _aiter(sources):
+    if hasattr(sources, '__aiter__'):
+        try:
+            async for source in sources:
+                yield source
+        finally:
+            if hasattr(sources, 'aclose'):
+                await sources.aclose()
+    else:
+        for source in sources:
+            yield source
+
+
+async def _anext(sources):
+    return await sources.__anext__()
@@ -0,0 +1,111 @@
+"""extract microformats from many documents using a pool of processes"""
+
+import multiprocessing
+
+import lxml.etree
+
+from microtron import Parser, Schema, Validator, default_schema, load
+
+
+class DocumentResult(object):
+    """the outcome of extracting microformats from a single document
+
+    source  -- the source, as passed to extract_many
+    results -- dict of results keyed by format, or None if the document
+               could not be parsed (or was only validated)
+    errors  -- the ParseErrors collected while parsing (with collect_errors)
+    error   -- description of the exception that stopped the document
+               being parsed, or None
+    """
+
+    def __init__(self, source, results=None, errors=(), error=None):
+        self.source = source
+        self.results = results
+        self.errors = list(errors)
+        self.error = error
+
+    def __repr__(self):
+        return '<DocumentResult %r: %s>' % (self.source, self.error or '%d errors' % len(self.errors))
+
+
+# the schema used by this (worker) process, see _init_worker()
+_schema = None
+
+def _init_worker(formats_file):
+    global _schema
+    if formats_file is None:
+        _schema = default_schema()
+    else:
+        _schema = Schema(lxml.etree.parse(formats_file))
+
+
+def extract(source, formats, schema=None, backend='html', validate=False, **options):
+    """extract microformats from a single document, as extract_many() does
+
+    schema -- the Schema (or mf.xml tree) to use, None for the bundled one
+
+    returns a DocumentResult
+    """
+    result = DocumentResult(source)
+    parser = None
+    try:
+        if validate:
+            parser = Validator(load(source, backend), schema, **options)
+            parser.validate(formats)
+        else:
+            parser = Parser(load(source, backend), schema, **options)
+            result.results = parser.parse_formats(formats)
+    except Exception as e:
+        result.error = '%s: %s' % (e.__class__.__name__, e)
+    if parser is not None:
+        result.errors = parser.errors
+    return result
+
+
+def _extract(job):
+    source, formats, backend, validate, options = job
+    return extract(source, formats, _schema, backend, validate, **options)
+
+
+def extract_many(sources, formats, workers=None, ordered=True, formats_file=None, backend='html', chunksize=1, validate=False, **options):
+    """extract microformats from each of sources, using a pool of processes
+
+    sources -- iterable of documents, as accepted by microtron.load()
+               (filenames, urls or document strings)
+    formats -- list of the microformats to extract (hcard, hnews, etc.)
+    workers -- number of worker processes (default: one per cpu). With
+               workers=0 the documents are parsed in this process.
+    ordered -- if True, results come back in the same order as sources,
+               otherwise in the order the documents are finished
+    formats_file -- the mf.xml to use (if None, use the bundled mf.xml);
+               each worker compiles it once
+    backend -- the parser backend to load documents with ('html' or 'xml')
+    validate -- if True, only check the documents with a Validator; each
+               DocumentResult then just carries the errors found
+    options -- passed on to Parser (strict, collect_errors, ...)
+
+    yields a DocumentResult for each source. A document that can't be
+    parsed is reported in its DocumentResult, and doesn't stop the batch.
+    """
+    formats = list(formats)
+    jobs = ((source, formats, backend, validate, options) for source in sources)
+
+    if workers == 0:
+        _init_worker(formats_file)
+        for job in jobs:
+            yield _extract(job)
+        return
+
+    pool = multiprocessing.Pool(workers, _init_worker, (formats_file,))
+    try:
+        if ordered:
+            results = pool.imap(_extract, jobs, chunksize)
+        else:
+            results = pool.imap_unordered(_extract, jobs, chunksize)
+        for result in results:
+            yield result
+        pool.close()
+    finally:
+        # only still running if the caller gave up on the results early
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,255 @@
+"""persistent caches of parse results, keyed by document content
+
+A store maps a key - a hash of the document, the format, the backend,
+the parser options that affect the results and the schema version - to the pickled
+results. Both stores are size-bounded: once full, the least recently
+used entries are evicted until only low_water of max_bytes is in use, so
+the cost of eviction is spread over many insertions:
+
+    store = SQLiteStore('results.db', max_bytes=100 * 1024 * 1024)
+    results = microtron.parse('page.html', 'hcard', cache=store)
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    from urllib2 import urlopen
+except ImportError:
+    from urllib.request import urlopen
+
+try:
+    unicode
+except NameError:
+    # python 3
+    unicode = basestring = str
+
+import microtron
+
+
+# options that change what Parser returns
+_key_options = ('strict', 'collect_errors', 'records')
+
+
+def read_source(source):
+    """the bytes of a document, given anything microtron.load() accepts"""
+    if isinstance(source, unicode):
+        if u'<' in source:
+            return source.encode('utf-8')
+        source = source.encode('utf-8')
+    if isinstance(source, bytearray):
+        return bytes(source)
+    if isinstance(source, bytes):
+        if b'<' in source:
+            return source
+        if source.startswith(b'file://'):
+            source = source[len(b'file://'):]
+        elif b'://' in source:
+            return urlopen(source.decode('utf-8')).read()
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.read()
+
+
+def cache_key(data, mf, schema, backend='html', **options):
+    """key for the results of parsing mf from the document data with backend ('html' or 'xml')"""
+    digest = hashlib.sha1(data)
+    digest.update(('\0%s\0%s\0%s' % (mf, schema.version, backend)).encode('utf-8'))
+    for option in _key_options:
+        digest.update(('\0%s=%s' % (option, bool(options.get(option)))).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cached_parse(source, mf, store, backend='html', **options):
+    """microtron.parse(), consulting store before parsing
+
+    Parsing with an lxml parser instance as the backend isn't cached, as
+    there is no telling what its settings do to the results.
+    """
+    if not isinstance(backend, basestring):
+        return microtron.Parser(microtron.load(source, backend), **options).parse_format(mf)
+    data = read_source(source)
+    key = cache_key(data, mf, microtron.get_schema(options.get('formats')), backend, **options)
+    results = store.get(key)
+    if results is None:
+        # a unicode document is parsed as it is: the bytes it was hashed as
+        # declare no encoding, so the html parser would take them as latin-1
+        if isinstance(source, unicode) and u'<' in source:
+            data = source
+        results = microtron.Parser(microtron.load(data, backend), **options).parse_format(mf)
+        store.put(key, results)
+    return results
+
+
+class SQLiteStore(object):
+    """results stored in a single sqlite database file
+
+    The total size of the entries is kept up to date by triggers, so it
+    is right however many processes share the file. Hits aren't written
+    back straight away: the times entries were used are saved with the
+    next put() (or every touch_batch hits, or on close()).
+    """
+
+    touch_batch = 100
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, low_water=0.9):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS total (size INTEGER)')
+            if self._db.execute('SELECT COUNT(*) FROM total').fetchone()[0] == 0:
+                self._db.execute('INSERT INTO total SELECT COALESCE(SUM(size), 0) FROM results')
+            self._db.execute('CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results '
+                             'BEGIN UPDATE total SET size = size + new.size; END')
+            self._db.execute('CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results '
+                             'BEGIN UPDATE total SET size = size - old.size; END')
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                with self._db:
+                    self._save_touched()
+        return pickle.loads(bytes(row[0]))
+
+    def put(self, key, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            with self._db:
+                self._save_touched()
+                # (not INSERT OR REPLACE, which doesn't fire the delete trigger)
+                self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+                self._db.execute('INSERT INTO results VALUES (?, ?, ?, ?)', (key, sqlite3.Binary(data), len(data), time.time()))
+                if self._db.execute('SELECT size FROM total').fetchone()[0] > self.max_bytes:
+                    self._evict()
+
+    def _save_touched(self):
+        if self._touched:
+            self._db.executemany('UPDATE results SET used = ? WHERE key = ?', [(used, key) for key, used in self._touched.items()])
+            self._touched = {}
+
+    def _evict(self):
+        total = self._db.execute('SELECT size FROM total').fetchone()[0]
+        target = self.max_bytes * self.low_water
+        keys = []
+        for key, size in self._db.execute('SELECT key, size FROM results ORDER BY used'):
+            if total <= target:
+                break
+            keys.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM results WHERE key = ?', keys)
+
+    def clear(self):
+        with self._lock:
+            self._touched = {}
+            with self._db:
+                self._db.execute('DELETE FROM results')
+
+    def close(self):
+        with self._lock:
+            with self._db:
+                self._save_touched()
+        self._db.close()
+
+
+class DirectoryStore(object):
+    """results stored one file per key in a directory
+
+    The file modification times record when entries were last used.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, low_water=0.9):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._total = sum(size for filename, used, size in self._entries())
+
+    def _filename(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def _touch(self, filename):
+        # the filesystem's own timestamps can be too coarse to order entries
+        now = time.time()
+        os.utime(filename, (now, now))
+
+    def _entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue    # still being written
+                filename = os.path.join(dirpath, filename)
+                try:
+                    info = os.stat(filename)
+                except OSError:
+                    continue
+                yield filename, info.st_mtime, info.st_size
+
+    def get(self, key):
+        filename = self._filename(key)
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+            self._touch(filename)
+        except (IOError, OSError):
+            return None
+        return pickle.loads(data)
+
+    def put(self, key, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        filename = self._filename(key)
+        dirname = os.path.dirname(filename)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                pass    # made by another process
+        # write to a temporary file first, so readers never see part of an entry
+        fd, tmpname = tempfile.mkstemp(prefix='.', dir=dirname)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmpname, filename)
+        self._touch(filename)
+
+        with self._lock:
+            self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._total = sum(size for filename, used, size in entries)
+        target = self.max_bytes * self.low_water
+        for filename, used, size in entries:
+            if self._total <= target:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            self._total -= size
+
+    def clear(self):
+        with self._lock:
+            for filename, used, size in list(self._entries()):
+                os.remove(filename)
+            self._total = 0
+
+    def close(self):
+        pass
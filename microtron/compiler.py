@@ -0,0 +1,253 @@
+"""compile microformat definitions into python code
+
+Parser._parse_property works out what to do with a property from its
+definition (its type, many, couldbe, values, ...) every time it parses
+one. Here a Format is turned into the source of a single function which
+parses all of its properties, with only the code their definitions call
+for, and that is compiled. Parser(compiled=True) uses these functions
+(through Format.extractor) instead; the results, errors and stats are
+the same as the interpreter's.
+
+Any Format can be compiled, whether it comes from the bundled mf.xml, a
+custom one or Schema.project(). To see the code for a format:
+
+    python -m microtron.compiler vcard
+"""
+
+import re
+import sys
+
+from microtron import ParseError, default_schema
+
+try:
+    basestring
+except NameError:
+    # python 3
+    basestring = str
+
+
+def _text_of(value):
+    """the text of a property value, as checked against its allowed values"""
+    if isinstance(value, basestring):
+        return value
+    return value['text'] if 'text' in value else ''
+
+
+# parser methods the generated code can call, bound once per element
+_helpers = (
+    ('find_props', '_find_props'),
+    ('parse_format', '_parse_format'),
+    ('parse_node', '_parse_node'),
+    ('parse_value', '_parse_value'),
+    ('parse_text', '_parse_text'),
+    ('parse_datetime_value', '_parse_datetime_value'),
+    ('error', '_error'),
+)
+
+_href_prefixes = ('mailto', 'tel', 'fax', 'modem')
+
+
+class _Writer(object):
+    """accumulates the lines of a function, and the names it refers to"""
+
+    def __init__(self):
+        self.lines = []
+        self.uses = set()
+        self.namespace = {}
+        self.depth = 1
+
+    def line(self, text, *args):
+        if text:
+            text = '    ' * self.depth + (text % args if args else text)
+        self.lines.append(text)
+
+    def call(self, helper):
+        self.uses.add(helper)
+        return helper
+
+    def bind(self, name, value):
+        """make value available to the generated code as name"""
+        self.namespace[name] = value
+        return name
+
+
+def _function_name(format):
+    return 'parse_' + re.sub(r'\W', '_', format.tag)
+
+
+def generate(format):
+    """the python source of a function parsing format, and its namespace
+
+    The function takes the parser and the element the format is rooted
+    at, and returns the result dict (as Parser._parse_node_uncached).
+    """
+    out = _Writer()
+    out.bind('format', format)
+    for i, prop in enumerate(format.properties):
+        _property(out, format, prop, i)
+
+    body = out.lines
+    out.lines = []
+    out.line("result = {'__type__': %r}", format.tag)
+    out.line('strict = parser.strict')
+    out.line('stats = parser.stats')
+    for name, method in _helpers:
+        if name in out.uses:
+            out.line('%s = parser.%s', name, method)
+    lines = ['def %s(parser, node):' % _function_name(format)] + out.lines + body
+    lines.append('    return result')
+    return '\n'.join(lines) + '\n', out.namespace
+
+
+def compile_format(format):
+    """a function parsing format, compiled from the code generate() writes"""
+    source, namespace = generate(format)
+    namespace.update(ParseError=ParseError, _text_of=_text_of)
+    exec(compile(source, '<microtron.compiler %s>' % format.tag, 'exec'), namespace)
+    return namespace[_function_name(format)]
+
+
+def _property(out, format, prop, i):
+    out.line('')
+    out.line('# %s', prop.name)
+    out.line('prop_nodes = %s(node, format, %s)', out.call('find_props'), out.bind('prop_%d' % i, prop))
+    if prop.mandatory:
+        out.line('if strict and not prop_nodes:')
+        out.line('    %s(ParseError(%r, node.sourceline))', out.call('error'),
+                 "missing mandatory %s property: %s" % (format.tag, prop.name))
+    if prop.many in ('many', 'manyasone'):
+        out.line('values = []')
+
+    out.line('for prop_node in prop_nodes:')
+    out.depth += 1
+    out.line('try:')
+    out.depth += 1
+    _value(out, prop, i)
+    out.depth -= 1
+    out.line('except Exception as e:')
+    out.line('    if strict:')
+    out.line('        %s(ParseError(%r %% (e,), sourceline=prop_node.sourceline))', out.call('error'),
+             "Error parsing value for property '%s': %%s" % (prop.name.replace('%', '%%'),))
+    out.line('        continue')
+    out.line('    if stats is not None:')
+    out.line("        stats.record('fallback')")
+    out.line('    value = %s(prop_node)', out.call('parse_value'))
+
+    if prop.many == 'manyasone':
+        out.line('value_text = _text_of(value)')
+    if prop.values:
+        out.line('if strict and %s.lower() not in %s:', 'value_text' if prop.many == 'manyasone' else '_text_of(value)',
+                 out.bind('values_%d' % i, prop.values))
+        out.line('    %s(ParseError(%r %% (value,), sourceline=prop_node.sourceline))', out.call('error'),
+                 "Invalid value for property '%s': %%s" % (prop.name.replace('%', '%%'),))
+        out.line('    continue')
+
+    if prop.many == 'many':
+        out.line('values.append(value)')
+    elif prop.many == 'manyasone':
+        out.line('if value_text:')
+        out.line('    values.append(value_text)')
+    else:
+        out.line('result[%r] = value', prop.name)
+        out.line('break')
+    out.depth -= 1
+
+    if prop.many == 'many':
+        out.line('if values:')
+        out.line('    result[%r] = values', prop.name)
+    elif prop.many == 'manyasone':
+        out.line('if values:')
+        out.line('    result[%r] = %r.join(values)', prop.name, prop.separator)
+
+
+def _value(out, prop, i):
+    """code setting value for prop_node (as the body of Parser._parse_property's loop)"""
+    if not prop.couldbe and prop.format is None:
+        _typed_value(out, prop, i)
+        return
+
+    out.line('value = {}')
+    for j, mf in enumerate(prop.couldbe):
+        out.line('if stats is not None:')
+        out.line("    stats.record('couldbe')")
+        out.line('try:')
+        out.line('    format_results = %s(%s, prop_node)', out.call('parse_format'),
+                 out.bind('subformat_%d_%d' % (i, j), prop.subformats.get(mf, mf)))
+        out.line('    if format_results and len(format_results[0]) > 1:')
+        out.line("        if '__type__' in value:")
+        out.line("            value['__type__'] += ' ' + format_results[0].pop('__type__')")
+        out.line('        value.update(format_results[0])')
+        out.line('except:')
+        out.line('    if stats is not None:')
+        out.line("        stats.record('couldbe_failed')")
+
+    if prop.format is not None:
+        out.line('try:')
+        out.line('    prop_result = %s(prop_node, %s)', out.call('parse_node'), out.bind('format_%d' % i, prop.format))
+        out.line('    if len(prop_result) > 1:')
+        out.line("        if '__type__' in value:")
+        out.line("            value['__type__'] += ' ' + prop_result.pop('__type__')")
+        out.line('        value.update(prop_result)')
+        out.line('except:')
+        out.line('    if stats is not None:')
+        out.line("        stats.record('compound_failed')")
+
+    out.line('if not value:')
+    out.depth += 1
+    _typed_value(out, prop, i)
+    out.depth -= 1
+
+
+def _typed_value(out, prop, i):
+    """code setting value from prop_node according to the property's type"""
+    prop_type = prop.type
+    if prop_type == 'text':
+        out.line('value = %s(prop_node)', out.call('parse_value'))
+
+    elif prop_type in ('url', 'email'):
+        out.line("value = {'__type__': %r, '__srcline__': prop_node.sourceline, 'text': %s(prop_node)}", prop_type, out.call('parse_text'))
+        out.line("href = prop_node.get('href')")
+        out.line('if href is not None:')
+        out.line("    value['href'] = href")
+        out.line('    scheme = href.lower()')
+        for k, prefix in enumerate(_href_prefixes):
+            out.line('    %s scheme.startswith(%r):', 'elif' if k else 'if', prefix + ':')
+            out.line('        value[%r] = href[%d:]', prefix, len(prefix) + 1)
+
+    elif prop_type == 'image':
+        out.line("value = {'__type__': %r, '__srcline__': prop_node.sourceline}", prop_type)
+        out.line('attrib = prop_node.attrib')
+        for name in ('title', 'alt', 'src'):
+            out.line('if %r in attrib:', name)
+            out.line('    value[%r] = attrib[%r]', name, name)
+
+    elif prop_type == 'object':
+        out.line("value = {'__type__': %r, '__srcline__': prop_node.sourceline, 'text': %s(prop_node)}", prop_type, out.call('parse_text'))
+        out.line('attrib = prop_node.attrib')
+        out.line("if 'data' in attrib:")
+        out.line("    value['data'] = attrib['data']")
+
+    elif prop_type in ('date', 'datetime'):
+        out.line("value = {'__type__': %r, '__srcline__': prop_node.sourceline, 'text': %s(prop_node), %r: %s(prop_node)}",
+                 prop_type, out.call('parse_text'), prop_type, out.call('parse_datetime_value'))
+
+    else:
+        # a sub-format
+        out.line('results = %s(%s, prop_node)', out.call('parse_format'),
+                 out.bind('subformat_%d' % i, prop.subformats.get(prop_type, prop_type)))
+        out.line('if results and len(results[0]) > 1:')
+        out.line('    value = results[0]')
+        out.line('else:')
+        out.line('    raise Exception(%r)', "Could not parse expected format: '%s'" % (prop_type,))
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    if len(argv) != 2:
+        sys.stderr.write('usage: python -m microtron.compiler <format>\n')
+        return 2
+    sys.stdout.write(generate(default_schema().get(argv[1]))[0])
+
+if __name__ == '__main__':
+    sys.exit(main())
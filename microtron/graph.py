@@ -0,0 +1,160 @@
+"""build a link graph out of the elemental formats (xfn, rel-license, ...) of many documents"""
+
+import array
+import multiprocessing
+
+try:
+    from urlparse import urljoin
+except ImportError:
+    from urllib.parse import urljoin
+
+import lxml.etree
+
+from microtron import Parser, load
+from microtron import batch
+
+
+# the formats whose links make up the graph, unless told otherwise
+default_formats = ('xfn', 'rel-license', 'rel-nofollow')
+
+_find_base = lxml.etree.XPath('(//*[local-name() = "base"]/@href)[1]')
+
+
+def document_links(tree, url=None, formats=default_formats, schema=None):
+    """the links made by the elemental formats of a document
+
+    tree    -- the document (as from microtron.load())
+    url     -- the document's url, which hrefs are resolved against
+               (default: the url it was loaded from). A <base href> in
+               the document is applied on top of it.
+    formats -- the elemental formats to take links from
+    schema  -- the Schema (or mf.xml tree) to use, None for the bundled one
+
+    returns a list of (href, format, feature) tuples. Links without an
+    href are left out.
+    """
+    if lxml.etree.iselement(tree):
+        tree = tree.getroottree()
+    base = url or tree.docinfo.URL or ''
+    for href in _find_base(tree):
+        base = urljoin(base, href.strip())
+
+    links = []
+    for mf, feature, nodes in Parser(tree, schema)._find_elemental(formats):
+        for node in nodes:
+            href = node.get('href')
+            if href is not None:
+                links.append((urljoin(base, href.strip()), mf, feature))
+    return links
+
+
+class LinkGraph(object):
+    """a link graph, with the edges stored in columns
+
+    urls      -- every url seen, each once; a url's id is its position
+    relations -- the (format, feature) pairs that label the edges, eg.
+                 ('xfn', 'friend'); a relation's id is its position
+    sources, targets, kinds -- arrays with one entry per edge: the ids of
+                 the linking document, the url linked to and the relation
+    failed    -- (source, error) for each document which couldn't be
+                 loaded by build_graph()
+    """
+
+    def __init__(self):
+        self.urls = []
+        self.relations = []
+        self._url_ids = {}
+        self._relation_ids = {}
+        self.sources = array.array('i')
+        self.targets = array.array('i')
+        self.kinds = array.array('H')
+        self.failed = []
+
+    def url_id(self, url):
+        """the id of url, adding it if it hasn't been seen before"""
+        url_id = self._url_ids.get(url)
+        if url_id is None:
+            url_id = self._url_ids[url] = len(self.urls)
+            self.urls.append(url)
+        return url_id
+
+    def relation_id(self, mf, feature):
+        """the id of the relation (mf, feature), adding it if need be"""
+        key = (mf, feature)
+        relation_id = self._relation_ids.get(key)
+        if relation_id is None:
+            relation_id = self._relation_ids[key] = len(self.relations)
+            self.relations.append(key)
+        return relation_id
+
+    def add(self, url, links):
+        """add the links of the document at url (as from document_links())"""
+        source = self.url_id(url)
+        for href, mf, feature in links:
+            self.sources.append(source)
+            self.targets.append(self.url_id(href))
+            self.kinds.append(self.relation_id(mf, feature))
+
+    def __len__(self):
+        return len(self.sources)
+
+    def edges(self):
+        """iterate over the edges as (source url, target url, (format, feature))"""
+        for source, target, kind in zip(self.sources, self.targets, self.kinds):
+            yield self.urls[source], self.urls[target], self.relations[kind]
+
+    def write(self, f):
+        """write the edges to the file f, one "source target format:feature" line each (tab separated)"""
+        for source, target, relation in self.edges():
+            f.write('%s\t%s\t%s:%s\n' % (source, target, relation[0], relation[1]))
+
+
+def _links(job):
+    source, formats, backend = job
+    try:
+        return source, document_links(load(source, backend), None, formats, batch._schema), None
+    except Exception as e:
+        return source, None, '%s: %s' % (e.__class__.__name__, e)
+
+
+def build_graph(sources, formats=default_formats, workers=None, formats_file=None, backend='html', chunksize=16, graph=None):
+    """build a LinkGraph from the elemental formats of each of sources
+
+    Documents are parsed in a pool of processes (as batch.extract_many()
+    does), and only their links come back to be added to the graph.
+
+    sources -- iterable of filenames or urls. Each one is used as the
+               url of its document.
+    formats -- the elemental formats to take links from
+    workers -- number of worker processes (default: one per cpu). With
+               workers=0 the documents are parsed in this process.
+    graph   -- a LinkGraph to add to (default: a new one)
+
+    returns the LinkGraph
+    """
+    if graph is None:
+        graph = LinkGraph()
+    formats = tuple(formats)
+    jobs = ((source, formats, backend) for source in sources)
+
+    pool = None
+    if workers == 0:
+        batch._init_worker(formats_file)
+        results = (_links(job) for job in jobs)
+    else:
+        pool = multiprocessing.Pool(workers, batch._init_worker, (formats_file,))
+        results = pool.imap_unordered(_links, jobs, chunksize)
+
+    try:
+        for source, links, error in results:
+            if error is None:
+                graph.add(source, links)
+            else:
+                graph.failed.append((source, error))
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return graph
@@ -0,0 +1,66 @@
+"""generate microtron/_mfdata.py, the bundled mf.xml as python data
+
+The default schema is built from _mfdata rather than by parsing mf.xml
+whenever microtron is used (it falls back to mf.xml if the two don't
+match). Run this after editing mf.xml:
+
+    python -m microtron.schemagen
+"""
+
+import hashlib
+import os
+import sys
+
+import lxml.etree
+
+from microtron import Schema
+
+try:
+    basestring
+except NameError:
+    # python 3
+    basestring = str
+
+
+def _definition(element):
+    children = tuple(_definition(child) for child in element if isinstance(child.tag, basestring))
+    return (str(element.tag), dict((str(key), str(value)) for key, value in element.attrib.items()), children)
+
+
+def _format(definition, indent=1):
+    """python source for a definition, the same whichever python writes it"""
+    tag, attrib, children = definition
+    pad = '    ' * indent
+    attrib = '{%s}' % ', '.join('%r: %r' % item for item in sorted(attrib.items()))
+    if not children:
+        return '%s(%r, %s, ())' % (pad, tag, attrib)
+    lines = ['%s(%r, %s, (' % (pad, tag, attrib)]
+    lines.extend(_format(child, indent + 1) + ',' for child in children)
+    lines.append(pad + '))')
+    return '\n'.join(lines)
+
+
+def generate(filename):
+    """the source of the _mfdata module for the mf.xml file filename"""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    tree = lxml.etree.parse(filename)
+    formats = tuple(_definition(element) for element in tree.getroot() if isinstance(element.tag, basestring))
+    return ('# generated from mf.xml by microtron.schemagen - do not edit\n\n'
+            '# sha1 of the mf.xml this was generated from\n'
+            'source = %r\n\n'
+            '# Schema.version for these definitions\n'
+            'version = %r\n\n'
+            'formats = (\n%s\n)\n') % (hashlib.sha1(data).hexdigest(), Schema(tree).version, '\n'.join(_format(format) + ',' for format in formats))
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    path = os.path.abspath(os.path.dirname(__file__))
+    source = generate(os.path.join(path, 'mf.xml'))
+    with open(os.path.join(path, '_mfdata.py'), 'w') as f:
+        f.write(source)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,98 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import lxml.etree, lxml.html
 from optparse import OptionParser
+import datetime
+import glob
+import json
 import os
 import pprint
 import sys
 
+import microtron
 from microtron import *
+from microtron.batch import extract_many
+from microtron.cache import SQLiteStore
+
+try:
+    unicode
+except NameError:
+    # python 3
+    unicode = str
+
+def _json_default(value):
+    """serialize the values json doesn't know about (dates and times as ISO 8601)"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError("can't serialize %r" % (value,))
+
+def _sources(arguments):
+    """the documents named on the command line ('-' reads names from stdin)"""
+    for argument in arguments:
+        if argument == '-':
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        elif glob.has_magic(argument):
+            for filename in sorted(glob.glob(argument)):
+                yield filename
+        else:
+            yield argument
+
+def _write_json(doc):
+    data = {'source': doc.source, 'results': doc.results,
+            'errors': [{'line': err.sourceline, 'message': unicode(err)} for err in doc.errors]}
+    if doc.error:
+        data['error'] = doc.error
+    sys.stdout.write(json.dumps(data, default=_json_default) + '\n')
+    sys.stdout.flush()
 
 def parse(argv = None):
     if argv is None:
         argv = sys.argv
 
-    parser = OptionParser('usage: %prog <file> <format>')
+    parser = OptionParser('usage: %prog [options] <file>... <format>[,<format>...]\n\n'
+                          'Files may be globs, or - to read a list of files from stdin.\n'
+                          'Several files are written out as JSON lines, one per file.')
     parser.add_option("-s", "--strict",
                   action="store_true", dest="strict", default=False,
                   help="be strict about parsing")
+    parser.add_option("-c", "--cache", dest="cache", metavar="FILE",
+                  help="look results up in (and save them to) this sqlite database")
+    parser.add_option("-j", "--jobs",
+                  type="int", dest="jobs", default=0,
+                  help="parse documents using N worker processes")
+    parser.add_option("-J", "--json",
+                  action="store_true", dest="json", default=False,
+                  help="write JSON lines, even for a single file")
     options, arguments = parser.parse_args(argv[1:])
-    if len(arguments) != 2:
+    if len(arguments) < 2:
         parser.error('Incorrect number of arguments')
-        
-    source_filename = os.path.abspath(arguments[0])
-    format = arguments[1]
 
-    tree = lxml.html.parse(source_filename)
-    pprint.pprint(Parser(tree, strict=options.strict).parse_format(format))
+    formats = arguments[-1].split(',')
+    arguments = arguments[:-1]
+
+    single = len(arguments) == 1 and not glob.has_magic(arguments[0]) and arguments[0] != '-'
+    if single and not options.json and not options.jobs:
+        source_filename = os.path.abspath(arguments[0])
+        cache = SQLiteStore(options.cache) if options.cache else None
+        results = dict((format, microtron.parse(source_filename, format, strict=options.strict, cache=cache)) for format in formats)
+        pprint.pprint(results if len(formats) > 1 else results[formats[0]])
+        return
+
+    if options.cache:
+        parser.error('--cache only works when printing a single file')
+
+    failed = False
+    for doc in extract_many(_sources(arguments), formats, workers=options.jobs, ordered=False,
+                            strict=options.strict, collect_errors=options.strict):
+        _write_json(doc)
+        failed = failed or doc.error is not None
+    if failed:
+        return 1
 
 if __name__ == '__main__':
     sys.exit(parse())
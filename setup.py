@@ -35,7 +35,6 @@ setup(
 
     install_requires = [
         'lxml >= 2.2.2',
-        'isodate >= 0.4.0',
         ],
     package_data = {'': ['*.xml']},
     packages = find_packages(exclude=['ez_setup']),
@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+from microtron import *
+from microtron.batch import extract_many
+import os, sys
+
+if sys.version_info >= (3, 7):
+    import asyncio
+    from microtron.aio import AsyncExtractor
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'asyncio extraction needs python 3.7')
+class TestAsync(unittest.TestCase):
+
+    def setUp(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        self.sources = [os.path.join(dirname, 'examples', example) for example in ('hcard.html', 'hcard2.html', 'hnews1.html')]
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _collect(self, stream, count=None):
+        results = []
+        while count is None or len(results) < count:
+            try:
+                results.append(self.loop.run_until_complete(stream.__anext__()))
+            except StopAsyncIteration:
+                break
+        return results
+
+    def test_stream(self):
+        expected = list(extract_many(self.sources, ['hcard', 'hnews'], workers=0))
+        for processes in (False, True):
+            extractor = AsyncExtractor(['hcard', 'hnews'], workers=2, processes=processes)
+            results = self._collect(extractor.extract_stream(self.sources, ordered=True))
+            extractor.close()
+            self.assertEqual([result.source for result in results], self.sources)
+            self.assertEqual([result.results for result in results], [result.results for result in expected])
+
+        extractor = AsyncExtractor(['hcard'], workers=2)
+        results = self._collect(extractor.extract_stream(self.sources + ['missing.html']))
+        extractor.close()
+        self.assertEqual(sorted(result.source for result in results), sorted(self.sources + ['missing.html']))
+        self.assertTrue([result for result in results if result.source == 'missing.html'][0].error)
+
+    def test_backpressure(self):
+        read = []
+        def sources():
+            for source in self.sources * 10:
+                read.append(source)
+                yield source
+
+        extractor = AsyncExtractor(['hcard'], workers=1, limit=2)
+        stream = extractor.extract_stream(sources())
+        results = self._collect(stream, 3)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(len(read) <= 3 + 2)
+
+        # closing the stream drops the documents still waiting
+        self.loop.run_until_complete(stream.aclose())
+        extractor.close()
+        self.assertTrue(len(read) < 30)
+
+    def test_abandon(self):
+        """stopping early closes the sources and leaves no tasks pending"""
+        loop = self.loop
+        class Sources(object):
+            # an async iterator, without the syntax python 2 can't read
+            closed = False
+            def __init__(self, sources):
+                self.sources = iter(sources)
+            def _done(self, result=None, exception=None):
+                future = loop.create_future()
+                if exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(result)
+                return future
+            def __aiter__(self):
+                return self
+            def __anext__(self):
+                for source in self.sources:
+                    return self._done(source)
+                return self._done(exception=StopAsyncIteration())
+            def aclose(self):
+                self.closed = True
+                return self._done()
+
+        sources = Sources(self.sources * 10)
+        extractor = AsyncExtractor(['hcard'], workers=1, limit=2)
+        stream = extractor.extract_stream(sources)
+        self.assertEqual(len(self._collect(stream, 1)), 1)
+        self.loop.run_until_complete(stream.aclose())
+        extractor.close()
+        self.assertTrue(sources.closed)
+        self.assertEqual([task for task in asyncio.all_tasks(self.loop) if not task.done()], [])
+
+    def test_extract(self):
+        async_extract = AsyncExtractor(['hnews'], strict=True, collect_errors=True).extract
+        result = self.loop.run_until_complete(async_extract(self.sources[2]))
+        self.assertEqual(result.results['hnews'][0]['source-org']['fn'], 'Associated Press')
+
+
+if __name__ == '__main__':
+    unittest.main()
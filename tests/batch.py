@@ -0,0 +1,46 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+from microtron import *
+from microtron.batch import extract_many
+import os
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        self.sources = [os.path.join(dirname, 'examples', example) for example in ('hcard.html', 'hcard2.html', 'hnews1.html')]
+
+    def test_extract_many(self):
+        sources = self.sources + [self.sources[0] + '.missing']
+        results = list(extract_many(sources, ['hcard', 'hnews'], workers=2))
+
+        self.assertEqual([result.source for result in results], sources)
+        for result in results[:3]:
+            self.assertEqual(result.error, None)
+            self.assertEqual(sorted(result.results.keys()), ['hcard', 'hnews'])
+
+        self.assertEqual(results[0].results['hcard'][0]['fn'], u'Mairie du 14\xe8me')
+        self.assertEqual(results[2].results['hnews'][0]['source-org']['fn'], 'Associated Press')
+
+        # a missing document is reported without stopping the batch
+        self.assertEqual(results[3].results, None)
+        self.assertTrue(results[3].error)
+
+    def test_errors(self):
+        serial = list(extract_many(self.sources, ['hnews'], workers=0, strict=True, collect_errors=True))
+        parallel = list(extract_many(self.sources, ['hnews'], workers=2, ordered=False, strict=True, collect_errors=True))
+        parallel.sort(key=lambda result: self.sources.index(result.source))
+
+        for first, second in zip(serial, parallel):
+            self.assertEqual([(str(e), e.sourceline) for e in first.errors],
+                             [(str(e), e.sourceline) for e in second.errors])
+            for e in second.errors:
+                self.assertTrue(isinstance(e, ParseError))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.etree
+from microtron import *
+from microtron.cache import SQLiteStore, DirectoryStore, cache_key, read_source
+import os, shutil, tempfile
+
+
+class StoreTests(object):
+    """tests common to both kinds of store"""
+
+    def test_get_put(self):
+        self.assertEqual(self.store.get('a' * 40), None)
+        self.store.put('a' * 40, [{'__type__': 'vcard', 'fn': 'Bob'}])
+        self.assertEqual(self.store.get('a' * 40), [{'__type__': 'vcard', 'fn': 'Bob'}])
+        self.store.clear()
+        self.assertEqual(self.store.get('a' * 40), None)
+
+    def test_eviction(self):
+        store = self.make_store(max_bytes=3000)
+        for i in range(10):
+            store.put('%040d' % i, 'x' * 1000)
+            # keep the first entry in use
+            self.assertEqual(store.get('%040d' % 0), 'x' * 1000)
+        self.assertEqual(store.get('%040d' % 0), 'x' * 1000)
+        self.assertEqual(store.get('%040d' % 9), 'x' * 1000)
+        self.assertEqual(store.get('%040d' % 5), None)
+
+    def test_low_water(self):
+        """eviction frees space down to low_water of max_bytes"""
+        store = self.make_store(max_bytes=3000, low_water=0.5)
+        for i in range(3):
+            store.put('%040d' % i, 'x' * 1000)
+        self.assertEqual([store.get('%040d' % i) is not None for i in range(3)], [False, False, True])
+        # and there is room for another without evicting again
+        store.put('%040d' % 3, 'x' * 1000)
+        self.assertEqual([store.get('%040d' % i) is not None for i in range(4)], [False, False, True, True])
+
+    def test_cached_parse(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        source_filename = dirname + '/examples/hcard2.html'
+        expected = parse(source_filename, 'hcard')
+        self.assertEqual(parse(source_filename, 'hcard', cache=self.store), expected)
+
+        # the second time round, the results come from the store
+        key = cache_key(read_source(source_filename), 'hcard', default_schema())
+        self.store.put(key, ['cached'])
+        self.assertEqual(parse(source_filename, 'hcard', cache=self.store), ['cached'])
+        self.assertEqual(parse(open(source_filename, 'rb'), 'hcard', cache=self.store), ['cached'])
+
+        # but not for different options
+        self.assertEqual(parse(source_filename, 'hcard', cache=self.store, strict=True), expected)
+
+    def test_backends(self):
+        doc = '<div class="vcard"><p class="fn">A<p>B</p></p></div>'
+        self.assertEqual(parse(doc, 'hcard', backend='xml', cache=self.store)[0]['fn'], 'AB')
+        self.assertEqual(parse(doc, 'hcard', backend='html', cache=self.store)[0]['fn'], 'A')
+        self.assertEqual(parse(doc, 'hcard', backend='xml', cache=self.store)[0]['fn'], 'AB')
+
+        # results from a parser instance aren't stored
+        self.assertEqual(parse(doc, 'hcard', backend=lxml.etree.XMLParser(), cache=self.store)[0]['fn'], 'AB')
+        self.assertEqual(parse(doc, 'hcard', backend='html', cache=self.store)[0]['fn'], 'A')
+
+    def test_cached_parse_unicode(self):
+        doc = u'<div class="vcard"><span class="fn">Jos\xe9</span></div>'
+        expected = parse(doc, 'hcard')
+        self.assertEqual(expected[0]['fn'], u'Jos\xe9')
+        self.assertEqual(parse(doc, 'hcard', cache=self.store), expected)
+        self.assertEqual(parse(doc, 'hcard', cache=self.store), expected)
+
+
+class TestSQLiteStore(StoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = self.make_store()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_total(self):
+        store = self.make_store(max_bytes=5000)
+        for i in range(20):
+            store.put('%040d' % (i % 7), 'x' * (100 * i))
+        total = store._db.execute('SELECT size FROM total').fetchone()[0]
+        self.assertEqual(total, store._db.execute('SELECT SUM(size) FROM results').fetchone()[0])
+        self.assertTrue(total <= 5000)
+
+        # hits are saved on close
+        store.get('%040d' % 5)
+        store.close()
+        store = SQLiteStore(store.path)
+        self.assertEqual(store._db.execute('SELECT key FROM results ORDER BY used DESC').fetchone()[0], '%040d' % 5)
+
+    def make_store(self, **kwargs):
+        return SQLiteStore(os.path.join(self.tmpdir, 'results%d.db' % len(os.listdir(self.tmpdir))), **kwargs)
+
+
+class TestDirectoryStore(StoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = self.make_store()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_store(self, **kwargs):
+        return DirectoryStore(os.path.join(self.tmpdir, 'results%d' % len(os.listdir(self.tmpdir))), **kwargs)
+
+if __name__ == '__main__':
+    unittest.main()
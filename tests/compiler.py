@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.etree
+import lxml.html
+from microtron import *
+from microtron import compiler
+import os
+
+
+FORMATS = """<microformats>
+    <card type="compound">
+        <fn mandatory="yes" type="text"/>
+        <url type="url" many="many"/>
+        <email type="email"/>
+        <photo type="image" many="many"/>
+        <data type="object"/>
+        <born type="date"/>
+        <seen type="datetime" many="many"/>
+        <kind values="person,org"/>
+        <note many="manyasone" separator="/"/>
+        <place couldbe="spot|card"/>
+        <spot type="spot"/>
+        <name>
+            <first mandatory="yes"/>
+            <last many="many"/>
+        </name>
+    </card>
+    <spot type="compound">
+        <lat type="text"/>
+        <long type="text"/>
+    </spot>
+</microformats>"""
+
+PAGE = """<div>
+<div class="card">
+    <span class="fn">Bob <b>Smith</b></span>
+    <a class="url" href="http://example.com/">home</a> <a class="url email" href="MAILTO:bob@example.com">mail</a>
+    <img class="photo" src="bob.png" alt="Bob" title="me"> <img class="photo" alt="no src">
+    <object class="data" data="bob.dat">data</object>
+    <abbr class="born" title="1970-01-02">Jan 2nd</abbr>
+    <span class="seen"><span class="value">2009-06-01</span> at <span class="value">10:30pm</span></span>
+    <span class="seen">whenever</span>
+    <span class="kind">Person</span>
+    <p class="note">one</p><p class="note"> </p><p class="note">two</p>
+    <span class="place spot"><span class="lat">1.5</span> <span class="long">-2</span></span>
+    <span class="name"><span class="first">Bob</span> <span class="last">Smith</span></span>
+    <div class="card"><span class="fn">Nested</span><span class="kind">robot</span></div>
+</div>
+<div class="card">
+    <span class="kind">alien</span>
+    <span class="place">nowhere</span>
+    <span class="spot">somewhere</span>
+    <span class="name">no first</span>
+    <abbr class="born">sometime</abbr>
+</div>
+</div>"""
+
+
+class TestCompiler(unittest.TestCase):
+    """the generated code gives the same results as interpreting the definitions"""
+
+    def setUp(self):
+        self.dirname = os.path.abspath(os.path.dirname(__file__))
+
+    def assertSame(self, tree, formats, mfs, msg, **options):
+        for strict in (False, True):
+            for index in (False, True):
+                interpreted = Parser(tree, formats, strict=strict, collect_errors=True, index=index, **options)
+                compiled = Parser(tree, formats, strict=strict, collect_errors=True, index=index, compiled=True, **options)
+                for mf in mfs:
+                    self.assertEqual(compiled.parse_format(mf), interpreted.parse_format(mf), '%s: %s' % (msg, mf))
+                self.assertEqual([(str(err), err.sourceline) for err in compiled.errors],
+                                 [(str(err), err.sourceline) for err in interpreted.errors], msg)
+
+    def test_examples(self):
+        schema = default_schema()
+        mfs = [format.name for format in schema.formats if format.type == 'compound']
+        for example in ('hcard.html', 'hcard2.html', 'hnews1.html'):
+            tree = lxml.html.parse(os.path.join(self.dirname, 'examples', example))
+            self.assertSame(tree, schema, mfs, example)
+
+    def test_custom_formats(self):
+        formats = lxml.etree.fromstring(FORMATS).getroottree()
+        tree = lxml.html.fromstring(PAGE).getroottree()
+        self.assertSame(tree, formats, ['card', 'spot'], 'custom')
+        self.assertSame(tree, formats, ['card'], 'custom records', records=True)
+
+        cards = Parser(tree, formats, compiled=True).parse_format('card')
+        self.assertEqual(cards[0]['email']['mailto'], 'bob@example.com')
+        self.assertEqual(cards[0]['note'], 'one/two')
+        self.assertEqual(cards[0]['place']['__type__'], 'spot')
+
+    def test_projection(self):
+        tree = lxml.html.parse(os.path.join(self.dirname, 'examples', 'hnews1.html'))
+        for fields in (['entry-title'], ['author.fn', 'updated'], ['source-org.adr.locality', 'geo']):
+            expected = Parser(tree).parse_format('hnews', fields=fields)
+            self.assertEqual(Parser(tree, compiled=True).parse_format('hnews', fields=fields), expected, fields)
+
+    def test_stats(self):
+        tree = lxml.html.parse(os.path.join(self.dirname, 'examples', 'hcard2.html'))
+        interpreted, compiled = ParserStats(), ParserStats()
+        Parser(tree, stats=interpreted).parse_format('hcard')
+        Parser(tree, stats=compiled, compiled=True).parse_format('hcard')
+        self.assertEqual(compiled.counts, interpreted.counts)
+
+    def test_generate(self):
+        source, namespace = compiler.generate(default_schema().get('hcard'))
+        self.assertTrue(source.startswith('def parse_vcard(parser, node):\n'))
+        self.assertTrue(namespace['format'] is default_schema().get('hcard'))
+        # each format is compiled once, and only the code its properties need is generated
+        self.assertTrue(default_schema().get('hcard').extractor is default_schema().get('hcard').extractor)
+        self.assertFalse('parse_datetime_value' in compiler.generate(default_schema().get('adr'))[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,8 +6,9 @@ import unittest
 
 import lxml.etree, lxml.html
 from microtron import *
+from microtron import _eval_datetime_fragment
 from datetime import datetime,date,time
-import os
+import os, pickle
 from pprint import pprint
 import pytz
 from isodate import tzinfo
@@ -115,5 +116,54 @@ class TestDateTime( unittest.TestCase ):
             result = self.parser._eval_as_tzinfo(input)
             self.assertEqual(time(0,0,0,0,result), time(0,0,0,0,expected))
 
+    def test_fragments(self):
+        """test classification of value-class-pattern fragments"""
+        testdata = (
+            ('2000-01-01', 'date', date(2000,01,01)),
+            ('1977-001', 'date', date(1977,01,01)),
+            ('1:15-0130', 'time', time(1,15,0,0,tzinfo.FixedOffset(-1,-30,'-0130'))),
+            ('13:30:00Z', 'time', time(13,30,0,0,tzinfo.Utc())),
+            ('10pm', 'time', time(22,0,0)),
+            ('+05:00', 'tzinfo', tzinfo.FixedOffset(5,0,'+05:00')),
+            ('z', 'tzinfo', tzinfo.Utc()),
+            ('2000-01', None, None),
+            ('', None, None),
+            ('noon', None, None),
+        )
+        for input,kind,expected in testdata:
+            result = _eval_datetime_fragment(input)
+            self.assertEqual(result[0], kind)
+            if kind == 'tzinfo':
+                self.assertEqual(time(0,0,0,0,result[1]), time(0,0,0,0,expected))
+            else:
+                self.assertEqual(result[1], expected)
+
+    def test_tzinfo(self):
+        """timezones are shared, and behave like isodate's"""
+        first = self.parser._eval_as_time('10:00+01:30')
+        second = self.parser._eval_as_datetime('2009-01-01T11:00+01:30')
+        self.assertTrue(first.tzinfo is second.tzinfo)
+        self.assertTrue(_eval_datetime_fragment('Z')[1] is self.parser._eval_as_time('10:00Z').tzinfo)
+
+        expected = tzinfo.FixedOffset(1,30,'+01:30')
+        self.assertEqual(first.tzinfo.utcoffset(None), expected.utcoffset(None))
+        self.assertEqual(first.tzinfo.tzname(None), '+01:30')
+        self.assertEqual(pickle.loads(pickle.dumps(second)), second)
+        self.assertEqual(pickle.loads(pickle.dumps(second)).tzinfo.tzname(None), '+01:30')
+
+    def test_datetimes(self):
+        """test _eval_as_datetime()"""
+        testdata = (
+            ('2009-04-19T18:17:29Z', datetime(2009,4,19,18,17,29,0,tzinfo.Utc())),
+            ('2009-04-19T18:17-0130', datetime(2009,4,19,18,17,0,0,tzinfo.FixedOffset(-1,-30,'-0130'))),
+            ('1977-032T10:15pm', datetime(1977,2,1,22,15)),
+            ('2009-04-19T10am', datetime(2009,4,19,10)),
+            ('2009-04-19t10:00', None),
+            ('2009-04-19', None),
+            ('2009-04-19T', None),
+        )
+        for input,expected in testdata:
+            self.assertEqual(self.parser._eval_as_datetime(input), expected)
+
 if __name__ == '__main__':
     unittest.main()
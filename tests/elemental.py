@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.html
+from microtron import *
+import os
+
+
+DOC = """<html><body>
+<a href="http://example.com/bob" rel="friend met  co-worker">Bob</a>
+<a href="http://example.com/me" rel="me me">me</a>
+<a rel="tag">no href</a>
+<p><a href="http://example.com/tags/python" rel="tag">python</a>
+<link rel="license" href="http://creativecommons.org/licenses/by/3.0/"/>
+<a href="http://example.com/x" rev="vote-for">yes</a> <a href="http://example.com/y" rev="vote-against nofollow" rel="nofollow">no</a></p>
+<span rel="friend">a span</span>
+</body></html>
+"""
+
+
+class TestElemental(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = lxml.html.fromstring(DOC)
+        self.schema = default_schema()
+        self.elemental = [format.name for format in self.schema.formats if format.type == 'elemental']
+
+    def expected(self, mf):
+        # one search per feature, as the results are ordered
+        results = []
+        for feature in self.schema.get(mf).properties:
+            for node in feature.find(self.doc):
+                results.append({'__type__': mf, 'value': feature.name, 'href': node.get('href'), 'text': node.text})
+        return results
+
+    def test_single_pass(self):
+        for index in (False, True):
+            parser = Parser(self.doc, index=index)
+            grouped = parser.parse_elemental()
+            self.assertEqual(sorted(grouped.keys()), sorted(self.elemental))
+            for mf in self.elemental:
+                self.assertEqual(grouped[mf], self.expected(mf))
+                self.assertEqual(parser.parse_format(mf), self.expected(mf))
+            self.assertEqual(parser.parse_formats(['xfn', 'hcard', 'rel-tag']),
+                             {'xfn': self.expected('xfn'), 'hcard': [], 'rel-tag': self.expected('rel-tag')})
+
+        xfn = Parser(self.doc).parse_format('xfn')
+        self.assertEqual([(r['value'], r['text']) for r in xfn], [('co-worker', 'Bob'), ('friend', 'Bob'), ('friend', 'a span'), ('me', 'me'), ('met', 'Bob')])
+        self.assertEqual(Parser(self.doc).parse_format('rel-tag')[0], {'__type__': 'rel-tag', 'value': 'tag', 'href': None, 'text': 'no href'})
+        self.assertEqual(len(Parser(self.doc).parse_format('votelinks')), 2)
+
+    def test_examples(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        for example in ('hcard.html', 'hcard2.html', 'hnews1.html'):
+            self.doc = lxml.html.parse(os.path.join(dirname, 'examples', example))
+            grouped = Parser(self.doc).parse_elemental()
+            for mf in self.elemental:
+                self.assertEqual(grouped[mf], self.expected(mf))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.html
+from microtron import *
+from microtron.graph import LinkGraph, build_graph, document_links
+import os, shutil, tempfile
+
+
+PAGES = {
+    'alice.html': """<html><body>
+<a href="bob.html" rel="friend met">Bob</a>
+<a href=" http://example.com/carol " rel="co-worker">Carol</a>
+<a rel="me">no href</a>
+<a href="/license" rel="license">license</a>
+<a href="tags/python" rel="tag">python</a>
+</body></html>""",
+    'bob.html': """<html><head><base href="http://example.com/bob/"></head><body>
+<a href="../alice" rel="friend">Alice</a>
+<a href="spam" rel="nofollow">spam</a>
+</body></html>""",
+}
+
+
+class TestGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.sources = []
+        for name in sorted(PAGES):
+            filename = os.path.join(self.dirname, name)
+            with open(filename, 'w') as f:
+                f.write(PAGES[name])
+            self.sources.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_document_links(self):
+        doc = lxml.html.fromstring(PAGES['alice.html'])
+        links = document_links(doc, 'http://example.com/alice/')
+        self.assertEqual(sorted(links), [
+            ('http://example.com/alice/bob.html', 'xfn', 'friend'),
+            ('http://example.com/alice/bob.html', 'xfn', 'met'),
+            ('http://example.com/carol', 'xfn', 'co-worker'),
+            ('http://example.com/license', 'rel-license', 'license'),
+        ])
+
+        # <base href> wins over the document's url
+        doc = lxml.html.fromstring(PAGES['bob.html'])
+        self.assertEqual(sorted(document_links(doc, 'http://elsewhere.com/')), [
+            ('http://example.com/alice', 'xfn', 'friend'),
+            ('http://example.com/bob/spam', 'rel-nofollow', 'nofollow'),
+        ])
+
+    def test_build_graph(self):
+        for workers in (0, 2):
+            graph = build_graph(self.sources + [os.path.join(self.dirname, 'missing.html')], workers=workers)
+            self.assertEqual(len(graph), 6)
+            self.assertEqual(len(graph.failed), 1)
+
+            alice, bob = self.sources
+            edges = sorted(graph.edges())
+            self.assertTrue((alice, os.path.join(self.dirname, 'bob.html'), ('xfn', 'friend')) in edges)
+            self.assertTrue((bob, 'http://example.com/alice', ('xfn', 'friend')) in edges)
+
+            # urls are stored once, however often they are linked to
+            self.assertEqual(len(graph.urls), len(set(graph.urls)))
+            self.assertEqual(len(graph.relations), 5)
+
+    def test_columns(self):
+        graph = LinkGraph()
+        graph.add('a', [('b', 'xfn', 'friend'), ('c', 'xfn', 'friend')])
+        graph.add('b', [('a', 'xfn', 'friend')])
+        self.assertEqual(graph.urls, ['a', 'b', 'c'])
+        self.assertEqual(list(graph.sources), [0, 0, 1])
+        self.assertEqual(list(graph.targets), [1, 2, 0])
+        self.assertEqual(list(graph.kinds), [0, 0, 0])
+        self.assertEqual(graph.relations, [('xfn', 'friend')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ from microtron import *
 import datetime, os
 from pprint import pprint
 #import pytz
+import isodate
 
 class TestHNews1(unittest.TestCase):
 
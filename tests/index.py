@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.etree, lxml.html
+from microtron import *
+import os
+
+
+FORMATS = """<microformats>
+    <product type="compound">
+        <name attribute="itemprop" type="text"/>
+        <price attribute="itemprop" type="text"/>
+    </product>
+    <data-rel type="elemental">
+        <follow attribute="data-rel"/>
+    </data-rel>
+</microformats>"""
+
+PAGE = """<div>
+    <div class="product"><span itemprop="name">Widget</span> <span itemprop="price">5</span></div>
+    <a data-rel="follow" href="/next">next</a>
+</div>"""
+
+class TestIndex(unittest.TestCase):
+
+    def test_examples(self):
+        """indexed lookups give the same results as xpath lookups"""
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        for example in ('hcard.html', 'hcard2.html', 'hnews1.html'):
+            tree = lxml.html.parse(os.path.join(dirname, 'examples', example))
+            for format in default_schema().formats:
+                expected = Parser(tree).parse_format(format.name)
+                result = Parser(tree, index=True).parse_format(format.name)
+                self.assertEqual(result, expected, '%s: %s' % (example, format.name))
+
+    def test_nested(self):
+        """properties of nested formats belong to the nearest root"""
+        doc = lxml.html.fromstring("""<div class="vcard">
+            <span class="fn">Outer</span>
+            <div class="agent vcard"><span class="fn">Inner</span></div>
+        </div>""")
+
+        for index in (False, True):
+            result = Parser(doc, index=index).parse_format('hcard')
+            self.assertEqual(len(result), 2)
+            self.assertEqual(result[0]['fn'], 'Outer')
+            self.assertEqual(result[0]['agent'][0]['fn'], 'Inner')
+            self.assertEqual(result[1]['fn'], 'Inner')
+
+    def test_no_document(self):
+        """a parser made without a document indexes the root it is given"""
+        doc = lxml.html.fromstring('<div class="vcard"><span class="fn">Bob</span></div>')
+        parser = Parser(None, index=True)
+        self.assertEqual(parser.parse_format('hcard', doc), Parser(doc).parse_format('hcard'))
+        self.assertTrue(parser.index is not None)
+
+    def test_other_attributes(self):
+        """properties in attributes other than class/rel/rev are indexed too"""
+        formats = lxml.etree.fromstring(FORMATS).getroottree()
+        doc = lxml.html.fromstring(PAGE)
+        self.assertEqual(get_schema(formats).attributes, ('class', 'data-rel', 'itemprop'))
+        for mf in ('product', 'data-rel'):
+            expected = Parser(doc, formats).parse_format(mf)
+            self.assertTrue(expected)
+            self.assertEqual(Parser(doc, formats, index=True).parse_format(mf), expected)
+
+        # an index without the attribute is bypassed rather than finding nothing
+        parser = Parser(doc, formats, index=True)
+        parser.index = DocumentIndex(doc)
+        self.assertEqual(parser.parse_format('product')[0]['name'], 'Widget')
+
+    def test_parse_all(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        tree = lxml.html.parse(os.path.join(dirname, 'examples', 'hnews1.html'))
+        results = Parser(tree).parse_all()
+        self.assertEqual(sorted(results.keys()), sorted(format.name for format in default_schema().formats))
+        for mf in ('hnews', 'hentry', 'hcard', 'rel-tag'):
+            self.assertEqual(results[mf], Parser(tree).parse_format(mf))
+
+        results = Parser(tree).parse_formats(['hcard', 'vcard'])
+        self.assertEqual(results['hcard'], results['vcard'])
+
+    def test_parse_formats_no_document(self):
+        doc = lxml.html.fromstring('<div class="vcard"><span class="fn">Bob</span> <a rel="tag" href="/tag/x">x</a></div>')
+        self.assertEqual(Parser(None).parse_formats(['hcard', 'rel-tag'], doc), Parser(doc).parse_formats(['hcard', 'rel-tag']))
+
+    def test_parse_formats_other_attributes(self):
+        """parse_formats (which always indexes) finds non-class/rel/rev properties"""
+        formats = lxml.etree.fromstring(FORMATS).getroottree()
+        doc = lxml.html.fromstring(PAGE)
+        expected = dict((mf, Parser(doc, formats).parse_format(mf)) for mf in ('product', 'data-rel'))
+        self.assertEqual(expected['product'][0]['name'], 'Widget')
+        self.assertEqual(expected['data-rel'][0]['value'], 'follow')
+        self.assertEqual(Parser(doc, formats).parse_formats(['product', 'data-rel']), expected)
+        self.assertEqual(Extractor(formats).parse_formats(doc, ['product', 'data-rel']), expected)
+
+if __name__ == '__main__':
+    unittest.main()
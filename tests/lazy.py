@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.html
+from microtron import *
+import os, pickle
+
+
+class CountingParser(Parser):
+
+    def _parse_property(self, node, format, prop):
+        self.parsed.append(prop.name)
+        return Parser._parse_property(self, node, format, prop)
+
+
+class TestLazy(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = os.path.abspath(os.path.dirname(__file__))
+
+    def test_examples(self):
+        """lazy results materialize to the same dicts the parser returns"""
+        for example in ('hcard.html', 'hcard2.html', 'hnews1.html'):
+            tree = lxml.html.parse(os.path.join(self.dirname, 'examples', example))
+            for format in default_schema().formats:
+                expected = Parser(tree).parse_format(format.name)
+                result = Parser(tree, lazy=True).parse_format(format.name)
+                self.assertEqual([dict(r) for r in result], expected, '%s: %s' % (example, format.name))
+                self.assertEqual(result, expected)
+
+    def test_on_access(self):
+        tree = lxml.html.parse(os.path.join(self.dirname, 'examples', 'hcard2.html'))
+        parser = CountingParser(tree, lazy=True)
+        parser.parsed = []
+        card = parser.parse_format('hcard')[0]
+        self.assertEqual(parser.parsed, [])
+
+        self.assertEqual(card['__type__'], 'vcard')
+        self.assertEqual(card['fn'], 'Jordan Daniel Clark')
+        self.assertTrue('note' not in card)
+        self.assertEqual(parser.parsed, ['fn', 'note'])
+
+        # resolved values are kept
+        card['fn']
+        self.assertEqual(parser.parsed, ['fn', 'note'])
+
+        data = card.materialize()
+        self.assertTrue(isinstance(data, dict))
+        self.assertEqual(data, Parser(tree).parse_format('hcard')[0])
+        self.assertEqual(pickle.loads(pickle.dumps(card)), data)
+
+    def test_errors(self):
+        doc = lxml.html.fromstring('<div class="vcard"><span class="tel"><span class="type">sideways</span> 555</span></div>')
+        parser = Parser(doc, strict=True, collect_errors=True, lazy=True)
+        card = parser.parse_format('hcard')[0]
+        self.assertEqual(parser.errors, [])
+        card['tel']
+        self.assertEqual(len(parser.errors), 1)
+        card.materialize()
+        self.assertEqual(len(parser.errors), 2)
+
+        self.assertRaises(ValueError, Parser, doc, lazy=True, records=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
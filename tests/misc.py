@@ -7,7 +7,7 @@ import unittest
 import lxml.etree, lxml.html
 from microtron import *
 from datetime import datetime,date,time
-import os
+import os, threading
 from pprint import pprint
 #import pytz
 from StringIO import StringIO
@@ -44,6 +44,216 @@ class TestDateTime(unittest.TestCase):
 
             self.assertEqual( result[0]['updated']['datetime'], expected )
 
+
+class TestValue(unittest.TestCase):
+
+    def test_no_class(self):
+        """a value taken from an element with no class attribute (a rel="tag" link)"""
+        doc = lxml.html.fromstring('<div class="hentry"><h2 class="entry-title">T</h2> <a rel="tag" href="/tag/x">x</a></div>')
+        self.assertEqual(Parser(doc).parse_format('hentry')[0]['tag'], ['x'])
+
+
+class TestMemoize(unittest.TestCase):
+
+    def setUp(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        self.tree = lxml.html.parse(dirname + '/examples/hnews1.html')
+
+    def test_memoize(self):
+        parser = Parser(self.tree)
+        expected = Parser(self.tree, memoize=False).parse_format('hcard')
+
+        parser.parse_format('hnews')
+        cached = len(parser._results)
+        self.assertTrue(cached > 0)
+
+        result = parser.parse_format('hcard')
+        self.assertEqual(result, expected)
+
+        # results are copies, so changing one doesn't affect the next
+        result[0]['fn'] = 'changed'
+        self.assertEqual(parser.parse_format('hcard'), expected)
+
+        # nor does changing a nested result
+        parser = Parser(self.tree)
+        news = parser.parse_format('hnews')
+        news[0]['author'][0]['fn'] = 'changed'
+        self.assertEqual(parser.parse_format('hcard'), expected)
+
+        parser.clear_cache()
+        self.assertEqual(len(parser._results), 0)
+
+        # the roots of the format asked for are only looked up, not stored
+        parser.parse_format('hcard')
+        self.assertEqual([format.tag for node, format in parser._results], ['org'])
+
+    def test_reset(self):
+        parser = Parser(self.tree)
+        parser.parse_format('hcard')
+        doc = lxml.html.fromstring('<div class="vcard"><span class="fn">Bob</span></div>')
+        parser.reset(doc)
+        self.assertEqual(parser.parse_format('hcard')[0]['fn'], 'Bob')
+
+
+class TestLoad(unittest.TestCase):
+
+    def test_sources(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        source_filename = dirname + '/examples/hcard.html'
+        expected = Parser(lxml.html.parse(source_filename)).parse_format('hcard')
+        data = open(source_filename, 'rb').read()
+
+        for source in (source_filename, 'file://' + source_filename, data, bytearray(data), StringIO(data)):
+            self.assertEqual(parse(source, 'hcard'), expected)
+
+        tree = lxml.html.parse(source_filename)
+        self.assertTrue(load(tree) is tree)
+
+    def test_backend(self):
+        doc = '<div class="vcard"><span class="fn">Bob</span></div>'
+        self.assertEqual(parse(doc, 'hcard', backend='xml')[0]['fn'], 'Bob')
+        self.assertEqual(parse(doc, 'hcard', backend=lxml.html.HTMLParser())[0]['fn'], 'Bob')
+        self.assertRaises(Exception, load, doc, 'nonexistent')
+
+
+class TestStats(unittest.TestCase):
+
+    def test_stats(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        tree = lxml.html.parse(dirname + '/examples/hnews1.html')
+        events = []
+        stats = ParserStats(callback=lambda event, elapsed: events.append(event))
+        parser = Parser(tree, strict=True, collect_errors=True, stats=stats)
+        result = parser.parse_format('hnews')
+
+        self.assertEqual(result, Parser(tree, strict=True, collect_errors=True).parse_format('hnews'))
+        self.assertEqual(stats.counts['parse_node:hnews'], 1)
+        self.assertTrue(stats.counts['parse_node:vcard'] >= 2)
+        self.assertTrue(stats.counts['find_props'] > 0)
+        self.assertTrue(stats.counts['datetime'] > 0)
+        self.assertEqual(stats.counts['error'], len(parser.errors))
+        self.assertTrue(stats.times['parse_node'] > 0)
+        self.assertEqual(len(events), sum(stats.counts.values()))
+
+        stats.reset()
+        self.assertEqual(stats.as_dict(), {'counts': {}, 'times': {}})
+
+    def test_couldbe(self):
+        doc = lxml.html.fromstring('<div class="vevent"><span class="summary">Party</span><span class="location">Home</span></div>')
+        stats = ParserStats()
+        Parser(doc, stats=stats).parse_format('hcalendar')
+        self.assertEqual(stats.counts['couldbe'], 3)
+
+    def test_disabled(self):
+        # without stats, the parser's methods are left alone
+        parser = Parser(None)
+        self.assertFalse('_parse_node' in parser.__dict__)
+
+
+class TestIncremental(unittest.TestCase):
+
+    page = """<html><body>
+<div class="sidebar">%s</div>
+<div class="vcard"><span class="fn">Alice</span> <abbr class="bday" title="1980-01-01">then</abbr></div>
+<div class="vcard"><span class="fn">%s</span>
+  <a class="url" href="http://example.com/">home</a></div>
+<div class="vcard"><img class="photo" src="bob.png"/></div>
+</body></html>"""
+
+    def test_incremental(self):
+        first = lxml.html.fromstring(self.page % ('news', 'Bob'))
+        parser = Parser(first, strict=True, collect_errors=True)
+        results, fingerprints = parser.parse_incremental('hcard')
+        self.assertEqual(results, Parser(first).parse_format('hcard'))
+        self.assertEqual(len(fingerprints), 3)
+        self.assertEqual(len(parser.errors), 1)     # third card has no fn
+
+        # the sidebar grows, moving everything down, and the second card changes
+        second = lxml.html.fromstring(self.page % ('more\nnews\n', 'Robert'))
+        stats = ParserStats()
+        parser = Parser(second, strict=True, collect_errors=True, stats=stats)
+        results, fingerprints = parser.parse_incremental('hcard', fingerprints)
+
+        expected_parser = Parser(second, strict=True, collect_errors=True)
+        expected = expected_parser.parse_format('hcard')
+        self.assertEqual(results, expected)
+        self.assertEqual(results[0]['bday']['__srcline__'], 5)
+        self.assertEqual([(str(e), e.sourceline) for e in parser.errors],
+                         [(str(e), e.sourceline) for e in expected_parser.errors])
+
+        # only the changed card was parsed again
+        self.assertEqual(stats.counts['parse_node:vcard'], 1)
+
+    def test_incremental_lazy(self):
+        """parse_incremental always returns materialized results"""
+        doc = lxml.html.fromstring(self.page % ('news', 'Bob'))
+        parser = Parser(doc, lazy=True)
+        results, fingerprints = parser.parse_incremental('hcard')
+        self.assertEqual([type(result) for result in results], [dict] * 3)
+        self.assertEqual(results, Parser(doc).parse_format('hcard'))
+        self.assertEqual(parser.parse_incremental('hcard', fingerprints)[0], results)
+
+    def test_incremental_settings(self):
+        """fingerprints from another schema or other options aren't reused"""
+        doc = lxml.html.fromstring(self.page % ('news', 'Bob'))
+        results, fingerprints = Parser(doc, strict=True, collect_errors=True).parse_incremental('hcard')
+
+        formats = lxml.etree.fromstring('<microformats><vcard type="compound" name="hcard"><fn type="text"/></vcard></microformats>').getroottree()
+        for parser in (Parser(doc, collect_errors=True), Parser(doc, formats)):
+            self.assertEqual(parser.parse_incremental('hcard', fingerprints)[0], parser.parse_format('hcard'))
+            self.assertEqual(parser.errors, [])
+
+class TestExtractor(unittest.TestCase):
+
+    def test_threads(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        trees = [lxml.html.parse(os.path.join(dirname, 'examples', example)) for example in ('hcard.html', 'hcard2.html', 'hnews1.html')]
+        expected = [Parser(tree).parse_formats(['hcard', 'hnews']) for tree in trees]
+
+        stats = ParserStats()
+        extractor = Extractor(index=True, stats=stats)
+        results = {}
+        def work(n):
+            for i in range(20):
+                for tree, want in zip(trees, expected):
+                    if extractor.parse_formats(tree, ['hcard', 'hnews']) != want:
+                        results[n] = False
+                        return
+            results[n] = True
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {0: True, 1: True, 2: True, 3: True})
+        self.assertEqual(stats.counts['index'], 4 * 20 * len(trees))
+
+        parser = Extractor(strict=True, collect_errors=True).parser(trees[0])
+        self.assertTrue(parser.schema is default_schema())
+        self.assertTrue(parser.strict)
+
+
+class TestText(unittest.TestCase):
+
+    def test_text(self):
+        doc = lxml.html.fromstring(u'<div class="vcard"><span class="fn">\n\tBob <b>  Smith</b>\u00a0Jr\n</span>'
+                                   u'<span class="org"><span class="organization-name">Acme</span> <span class="organization-unit"> R&amp;D </span></span></div>')
+        parser = Parser(doc)
+        card = parser.parse_format('hcard')[0]
+        self.assertEqual(card['fn'], u'Bob Smith\u00a0Jr')
+        self.assertEqual(card['fn'], doc.xpath('normalize-space(string(//span[@class="fn"]))'))
+        self.assertEqual(card['org'][0]['organization-unit'], ['R&D'])
+        self.assertTrue(parser._texts)
+
+        # manyasone properties are joined with their separator
+        doc = lxml.html.fromstring('<div class="vcard"><span class="fn">Bob</span><p class="note">one</p><p class="note"> </p><p class="note">two</p></div>')
+        self.assertEqual(Parser(doc).parse_format('hcard')[0]['note'], 'one two')
+
+        parser.clear_cache()
+        self.assertEqual(parser._texts, {})
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,53 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.etree, lxml.html
+from microtron import *
+import datetime, os, pickle
+
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = os.path.abspath(os.path.dirname(__file__))
+
+    def test_examples(self):
+        """records convert back to the same dicts the parser returns"""
+        for example in ('hcard.html', 'hcard2.html', 'hnews1.html'):
+            tree = lxml.html.parse(os.path.join(self.dirname, 'examples', example))
+            for format in default_schema().formats:
+                expected = Parser(tree).parse_format(format.name)
+                result = Parser(tree, records=True).parse_format(format.name)
+                for record in result:
+                    self.assertTrue(isinstance(record, Record))
+                self.assertEqual([record.to_dict() for record in result], expected, '%s: %s' % (example, format.name))
+
+    def test_access(self):
+        tree = lxml.html.parse(os.path.join(self.dirname, 'examples', 'hcard2.html'))
+        card = Parser(tree, records=True).parse_format('hcard')[0]
+
+        self.assertEqual(card.fn, 'Jordan Daniel Clark')
+        self.assertEqual(card['fn'], 'Jordan Daniel Clark')
+        self.assertEqual(card.n.family_name, ['Clark'])
+        self.assertEqual(card.n['family-name'], ['Clark'])
+        self.assertEqual(card.email[0].mailto, 'mail@jdclark.org')
+        self.assertEqual(card.bday.date, datetime.date(1982, 4, 9))
+        self.assertEqual(card.tel[0].type, ['home'])
+        self.assertEqual(card.__type__, 'vcard')
+
+        self.assertFalse('note' in card)
+        self.assertEqual(card.get('note'), None)
+        self.assertRaises(KeyError, lambda: card['note'])
+        self.assertRaises(AttributeError, lambda: card.note)
+        self.assertRaises(AttributeError, setattr, card, 'unknown', 1)
+
+    def test_pickle(self):
+        tree = lxml.html.parse(os.path.join(self.dirname, 'examples', 'hnews1.html'))
+        result = Parser(tree, records=True).parse_format('hnews')
+        self.assertEqual(pickle.loads(pickle.dumps(result, 2)), result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.etree, lxml.html
+from microtron import *
+import os
+
+
+class TestSchema(unittest.TestCase):
+
+    def setUp(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        formats_filename = dirname + '/../microtron/mf.xml'
+        self.schema = Schema(lxml.etree.parse(formats_filename))
+
+    def test_lookup(self):
+        # formats can be found by name or by tag
+        self.assertTrue(self.schema.get('hcard') is self.schema.get('vcard'))
+        self.assertEqual(self.schema.get('hcalendar').tag, 'vevent')
+        self.assertRaises(Exception, self.schema.get, 'nonexistent')
+
+    def test_properties(self):
+        vevent = self.schema.get('vevent')
+        location = [prop for prop in vevent.properties if prop.name == 'location'][0]
+        self.assertEqual(location.couldbe, ('vcard', 'adr', 'geo'))
+        self.assertEqual(location.type, 'text')
+        self.assertEqual(location.format, None)
+
+        vcard = self.schema.get('vcard')
+        tel = [prop for prop in vcard.properties if prop.name == 'tel'][0]
+        self.assertEqual(tel.many, 'many')
+        self.assertEqual([p.name for p in tel.format.properties], ['type', 'value'])
+        self.assertEqual(tel.format.properties[0].values, frozenset(['home', 'msg', 'work', 'pref', 'voice', 'fax', 'cell', 'video', 'bbs', 'modem', 'car', 'isdn', 'pcs']))
+
+    def test_generated(self):
+        """the generated definitions match mf.xml"""
+        from microtron import _mfdata
+        from microtron.schemagen import generate
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        formats_filename = dirname + '/../microtron/mf.xml'
+        self.assertEqual(generate(formats_filename), open(os.path.join(dirname, '..', 'microtron', '_mfdata.py')).read(),
+                         'mf.xml has changed: run python -m microtron.schemagen')
+
+        def dump(format):
+            return (format.tag, format.name, format.type, [(prop.name, prop.type, prop.mandatory, prop.attribute, prop.many, prop.couldbe,
+                     prop.values, prop.separator, prop.format and dump(prop.format)) for prop in format.properties])
+
+        schema = Schema._from_data(_mfdata, formats_filename)
+        self.assertEqual(schema.version, self.schema.version)
+        self.assertEqual([dump(format) for format in schema.formats], [dump(format) for format in self.schema.formats])
+        self.assertEqual(lxml.etree.tostring(schema.tree), lxml.etree.tostring(self.schema.tree))
+
+    def test_default_schema_shared(self):
+        self.assertTrue(default_schema() is default_schema())
+        self.assertTrue(Parser(None).schema is Parser(None).schema)
+
+    def test_tree_compiled_once(self):
+        """parsers given the same mf.xml tree share its Schema"""
+        tree = self.schema.tree
+        self.assertTrue(Parser(None, tree).schema is Parser(None, tree).schema)
+        self.assertTrue(get_schema(tree) is get_schema(tree.getroot()))
+        self.assertTrue(Parser(None, tree).formats.getroot() is tree.getroot())
+
+        # an element within a larger document is compiled on its own
+        wrapped = lxml.etree.fromstring('<wrapper><microformats><x type="compound"><y/></x></microformats></wrapper>')
+        self.assertEqual([format.tag for format in get_schema(wrapped[0]).formats], ['x'])
+
+    def test_shared_between_parsers(self):
+        doc = lxml.html.fromstring('<div class="vcard"><span class="fn">Bob</span></div>')
+        first = Parser(doc, self.schema).parse_format('hcard')
+        second = Parser(doc, self.schema).parse_format('hcard')
+        self.assertEqual(first, second)
+        self.assertEqual(first[0]['fn'], 'Bob')
+
+
+class TestProjection(unittest.TestCase):
+
+    def setUp(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        self.tree = lxml.html.parse(dirname + '/examples/hnews1.html')
+
+    def test_project(self):
+        schema = default_schema()
+        hentry = schema.project('hentry', ['entry-title', 'author.fn'])
+        self.assertTrue(hentry is schema.project('hentry', ['author.fn', 'entry-title']))
+        self.assertEqual([prop.name for prop in hentry.properties], ['author', 'entry-title'])
+        author = hentry.properties[0]
+        self.assertEqual([prop.name for prop in author.subformats['vcard'].properties], ['fn'])
+
+        # the full definitions are left alone
+        self.assertTrue(len(schema.get('hentry').properties) > 2)
+
+        self.assertRaises(Exception, schema.project, 'hentry', ['nonexistent'])
+        self.assertRaises(Exception, schema.project, 'hentry', ['author.nonexistent'])
+        self.assertRaises(Exception, schema.project, 'hentry', ['entry-title.fn'])
+
+    def test_parse_fields(self):
+        full = Parser(self.tree).parse_format('hnews')
+        result = Parser(self.tree).parse_format('hnews', fields=['entry-title', 'author.fn'])
+        self.assertEqual(len(result), len(full))
+        for entry, expected in zip(result, full):
+            self.assertEqual(sorted(entry.keys()), ['__type__', 'author', 'entry-title'])
+            self.assertEqual(entry['entry-title'], expected['entry-title'])
+            self.assertEqual([author['fn'] for author in entry['author']], [author['fn'] for author in expected['author']])
+            self.assertEqual(sorted(entry['author'][0].keys()), ['__type__', 'fn'])
+
+        tree = lxml.html.parse(os.path.join(os.path.dirname(__file__), 'examples', 'hcard2.html'))
+        vcard = Parser(tree).parse_format('hcard', fields=['n.family-name', 'adr.locality'])[0]
+        self.assertEqual(vcard, {'__type__': 'vcard', 'n': {'__type__': 'n', 'family-name': ['Clark']}, 'adr': [{'__type__': 'adr', 'locality': 'Neath'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
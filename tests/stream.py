@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.etree, lxml.html
+from microtron import *
+import os
+from StringIO import StringIO
+
+
+class TestIterparse(unittest.TestCase):
+
+    def test_examples(self):
+        """streamed results match those from the whole tree"""
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        for example in ('hcard.html', 'hcard2.html', 'hnews1.html'):
+            source_filename = os.path.join(dirname, 'examples', example)
+            tree = lxml.html.parse(source_filename)
+            for mf in ('hcard', 'hnews', 'hentry'):
+                expected = Parser(tree).parse_format(mf)
+                result = [r for f, r in Parser(None).iterparse(source_filename, [mf])]
+                self.assertEqual(result, expected, '%s: %s' % (example, mf))
+
+    def test_nested(self):
+        entries = ''.join("""<div class="hentry">
+            <h2 class="entry-title">Entry %d</h2>
+            <span class="author vcard"><span class="fn">Author %d</span></span>
+            <abbr class="updated" title="2009-04-19T18:17:29Z">then</abbr>
+        </div>""" % (i, i) for i in range(50))
+        doc = '<html><body><div class="sidebar">junk</div>%s</body></html>' % entries
+
+        tree = lxml.html.fromstring(doc)
+        parser = Parser(tree)
+        expected = []
+        for entry in parser.parse_format('hentry', tree):
+            expected.append(('hentry', entry))
+            expected.append(('hcard', entry['author'][0]))
+
+        result = list(Parser(None).iterparse(StringIO(doc), ['hentry', 'hcard']))
+        self.assertEqual(result, expected)
+
+    def test_index(self):
+        """each outermost root is indexed as it is read"""
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        source_filename = os.path.join(dirname, 'examples', 'hnews1.html')
+        expected = list(Parser(None).iterparse(source_filename, ['hnews', 'hcard']))
+        self.assertTrue(expected)
+        stats = ParserStats()
+        self.assertEqual(list(Parser(None, index=True, stats=stats).iterparse(source_filename, ['hnews', 'hcard'])), expected)
+        self.assertTrue(stats.counts['index'] > 0)
+
+    def test_lazy(self):
+        """lazy results are complete, although their elements have gone"""
+        doc = ''.join('<div class="vcard"><span class="fn">Bob %d</span> <span class="org">Acme</span></div>' % i for i in range(3))
+        result = [r for f, r in Parser(None, lazy=True).iterparse(StringIO('<html><body>%s</body></html>' % doc), ['hcard'])]
+        self.assertEqual([card['fn'] for card in result], ['Bob 0', 'Bob 1', 'Bob 2'])
+        self.assertEqual(result, Parser(lxml.html.fromstring(doc)).parse_format('hcard'))
+
+    def test_elemental(self):
+        self.assertRaises(Exception, lambda: list(Parser(None).iterparse(StringIO('<html/>'), ['rel-tag'])))
+
+if __name__ == '__main__':
+    unittest.main()
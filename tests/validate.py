@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import unittest
+
+import lxml.etree
+import lxml.html
+from microtron import *
+from microtron.batch import extract_many
+import os
+
+
+BROKEN = """<html><body>
+<div class="vcard">
+  <span class="tel"><span class="type">sideways</span> <span class="value">555 1234</span></span>
+  <abbr class="bday">yesterday</abbr>
+</div>
+<div class="hentry">
+  <h1 class="entry-title">Headline</h1>
+  <abbr class="published" title="2009-13-45">then</abbr>
+  <span class="updated"><span class="value-title"></span></span>
+  <div class="author vcard"><span class="fn">  Bob
+    Smith </span><img class="photo"/></div>
+</div>
+</body></html>
+"""
+
+FORMATS = """<microformats>
+    <card type="compound">
+        <fn mandatory="yes" type="text"/>
+        <url type="url" many="manyasone"/>
+        <photo type="image" many="manyasone"/>
+        <born type="date"/>
+        <seen type="datetime" many="many"/>
+        <kind values="person,org"/>
+        <note many="manyasone" separator="/"/>
+        <place couldbe="spot|card"/>
+        <spot type="spot"/>
+    </card>
+    <spot type="compound">
+        <lat type="text" mandatory="yes"/>
+        <long type="text"/>
+    </spot>
+</microformats>"""
+
+PAGE = """<div>
+<div class="card">
+    <span class="fn"><abbr>Bob</abbr> <span class="value">Smith</span></span>
+    <a class="url" href="http://example.com/"> </a> <img class="photo" src="bob.png">
+    <abbr class="born">1970-01-02</abbr> <abbr class="born" title="1970-01-02">then</abbr>
+    <span class="seen"><span class="value">10:30pm</span></span>
+    <span class="seen"><span class="value">2009-06-01</span> <span class="value">soon</span></span>
+    <p class="note"><img class="value"></p><p class="note"><abbr class="value" title="">one</abbr></p>
+    <span class="place"><span class="long">-2</span> <span class="card"><span class="kind">robot</span></span></span>
+    <span class="spot">nowhere</span>
+</div>
+</div>"""
+
+
+class TestValidate(unittest.TestCase):
+
+    def setUp(self):
+        dirname = os.path.abspath(os.path.dirname(__file__))
+        self.sources = [os.path.join(dirname, 'examples', example) for example in ('hcard.html', 'hcard2.html', 'hnews1.html')]
+
+    def _errors(self, errors):
+        # a strict parser reports some errors more than once
+        return sorted(set((e.sourceline, str(e)) for e in errors))
+
+    def test_same_errors(self):
+        docs = [lxml.html.parse(source) for source in self.sources]
+        docs.append(lxml.html.fromstring(BROKEN))
+        for doc in docs:
+            parser = Parser(doc, strict=True, collect_errors=True)
+            parser.parse_formats(['hcard', 'hentry', 'hnews'])
+            errors = Validator(doc).validate(['hcard', 'hentry', 'hnews'])
+            self.assertEqual(self._errors(errors), self._errors(parser.errors))
+
+        # the broken document really is broken
+        self.assertTrue(len(errors) >= 4)
+        self.assertEqual(errors, sorted(errors, key=lambda err: err.sourceline))
+
+    def test_custom_formats(self):
+        formats = lxml.etree.fromstring(FORMATS).getroottree()
+        tree = lxml.html.fromstring(PAGE).getroottree()
+        parser = Parser(tree, formats, strict=True, collect_errors=True)
+        parser.parse_formats(['card', 'spot'])
+        errors = Validator(tree, formats).validate(['card', 'spot'])
+        self.assertEqual(self._errors(errors), self._errors(parser.errors))
+        self.assertEqual(len(errors), len(self._errors(errors)))
+        self.assertTrue(len(errors) >= 6)
+
+    def test_validate_many(self):
+        for doc in extract_many(self.sources, ['hnews'], workers=0, validate=True):
+            self.assertEqual(doc.error, None)
+            self.assertEqual(doc.results, None)
+            parser = Parser(lxml.html.parse(doc.source), strict=True, collect_errors=True)
+            parser.parse_format('hnews')
+            self.assertEqual(self._errors(doc.errors), self._errors(parser.errors))
+
+
+if __name__ == '__main__':
+    unittest.main()